@@ -1,26 +1,97 @@
+import importlib
 import logging
-from fair_research_login.client import NativeClient
-from fair_research_login.token_storage import (ConfigParserTokenStorage,
-                                               MultiClientTokenStorage,
-                                               JSONTokenStorage,
-                                               )
-from fair_research_login.code_handler import (InputCodeHandler, CodeHandler)
-from fair_research_login.local_server import LocalServerCodeHandler
-from fair_research_login.exc import (LoginException, LoadError, ScopesMismatch,
-                                     TokensExpired, LocalServerError,
-                                     AuthFailure)
+from typing import TYPE_CHECKING
+
+# Attributes are imported on first access (PEP 562), so scripts which only
+# need token storage do not pay to import the Globus SDK or local server.
+_LAZY_ATTRS = {
+    'NativeClient': 'fair_research_login.client',
+    'AsyncNativeClient': 'fair_research_login.async_client',
+    'Metrics': 'fair_research_login.metrics',
+    'StatsdExporter': 'fair_research_login.metrics',
+    'TokenBroker': 'fair_research_login.broker',
+    'BrokerTokenStorage': 'fair_research_login.broker',
+
+    'JSONTokenStorage': 'fair_research_login.token_storage',
+    'ConfigParserTokenStorage': 'fair_research_login.token_storage',
+    'MultiClientTokenStorage': 'fair_research_login.token_storage',
+    'SQLiteTokenStorage': 'fair_research_login.token_storage',
+    'MultiClientSQLiteTokenStorage': 'fair_research_login.token_storage',
+    'BinaryTokenStorage': 'fair_research_login.token_storage',
+    'MultiClientBinaryTokenStorage': 'fair_research_login.token_storage',
+    'WriteBehindTokenStorage': 'fair_research_login.token_storage',
+
+    'CodeHandler': 'fair_research_login.code_handler',
+    'InputCodeHandler': 'fair_research_login.code_handler',
+    'LocalServerCodeHandler': 'fair_research_login.local_server',
+
+    'LoginException': 'fair_research_login.exc',
+    'LoadError': 'fair_research_login.exc',
+    'ScopesMismatch': 'fair_research_login.exc',
+    'TokensExpired': 'fair_research_login.exc',
+    'LocalServerError': 'fair_research_login.exc',
+    'AuthFailure': 'fair_research_login.exc',
+    'RevocationFailed': 'fair_research_login.exc',
+    'BrokerError': 'fair_research_login.exc',
+}
+
+# Submodules were imported by this module before attributes became lazy, so
+# ``fair_research_login.exc`` and the like keep working without an import.
+_SUBMODULES = {
+    'client', 'exc', 'token_storage', 'code_handler', 'local_server',
+    'version', 'async_client', 'broker', 'metrics', 'refresher',
+}
+
+if TYPE_CHECKING:  # pragma: no cover
+    from fair_research_login.client import NativeClient
+    from fair_research_login.async_client import AsyncNativeClient
+    from fair_research_login.metrics import Metrics, StatsdExporter
+    from fair_research_login.broker import TokenBroker, BrokerTokenStorage
+    from fair_research_login.token_storage import (
+        ConfigParserTokenStorage, MultiClientTokenStorage, JSONTokenStorage,
+        SQLiteTokenStorage, MultiClientSQLiteTokenStorage, BinaryTokenStorage,
+        MultiClientBinaryTokenStorage, WriteBehindTokenStorage,
+    )
+    from fair_research_login.code_handler import (InputCodeHandler,
+                                                  CodeHandler)
+    from fair_research_login.local_server import LocalServerCodeHandler
+    from fair_research_login.exc import (
+        LoginException, LoadError, ScopesMismatch, TokensExpired,
+        LocalServerError, AuthFailure, RevocationFailed, BrokerError
+    )
 
 __all__ = [
-    'NativeClient',
+    'NativeClient', 'AsyncNativeClient', 'Metrics', 'StatsdExporter',
+    'TokenBroker', 'BrokerTokenStorage',
 
     'JSONTokenStorage', 'ConfigParserTokenStorage',
-    'MultiClientTokenStorage',
+    'MultiClientTokenStorage', 'SQLiteTokenStorage',
+    'MultiClientSQLiteTokenStorage', 'BinaryTokenStorage',
+    'MultiClientBinaryTokenStorage', 'WriteBehindTokenStorage',
 
     'CodeHandler', 'InputCodeHandler', 'LocalServerCodeHandler',
 
     'LoginException', 'LoadError', 'ScopesMismatch', 'TokensExpired',
-    'LocalServerError', 'AuthFailure',
+    'LocalServerError', 'AuthFailure', 'RevocationFailed', 'BrokerError',
 ]
 
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        # Importing a submodule also sets it as an attribute of this module
+        return importlib.import_module('{}.{}'.format(__name__, name))
+    if name not in _LAZY_ATTRS:
+        raise AttributeError('module {!r} has no attribute {!r}'
+                             ''.format(__name__, name))
+    value = getattr(importlib.import_module(_LAZY_ATTRS[name]), name)
+    # Cache the attribute so later lookups skip __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+
 # https://docs.python.org/3/howto/logging.html#configuring-logging-for-a-library  # noqa
 logging.getLogger("fair_research_login").addHandler(logging.NullHandler())
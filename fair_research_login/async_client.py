@@ -0,0 +1,131 @@
+import asyncio
+from functools import partial
+from typing import List, Mapping
+
+from fair_research_login.client import NativeClient
+
+
+class AsyncNativeClient(object):
+    r"""
+    An asyncio interface to :class:`NativeClient \
+    <fair_research_login.NativeClient>` for apps running an event loop. All
+    arguments are passed to NativeClient, or an existing client may be
+    wrapped with ``native_client``.
+
+    The Globus SDK and token storage are synchronous, so network calls and
+    storage I/O run in ``executor`` (The event loop's default executor if
+    None) and never block the event loop. With a ``token_cache``, tokens and
+    authorizers which are cached and do not need refreshing are returned
+    directly on the event loop, without waiting for the executor. Refreshes
+    and revocations for each resource server are run concurrently.
+
+    .. code-block:: python
+
+        cli = AsyncNativeClient(client_id='my_id', app_name='my cool app')
+        authorizers = await cli.get_authorizers()
+
+    :param executor: A concurrent.futures.Executor for blocking calls
+    :param native_client: A NativeClient to use instead of creating one
+    """
+
+    def __init__(self, *args, executor=None, native_client=None, **kwargs):
+        self.native_client = native_client or NativeClient(*args, **kwargs)
+        self.executor = executor
+
+    async def run(self, func, *args, **kwargs):
+        """Run a blocking function in the executor and return its result."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor,
+                                          partial(func, *args, **kwargs))
+
+    async def login(self, *args, **kwargs):
+        """
+        Like NativeClient.login(). The flow runs in the executor, including
+        waiting on the LocalServerCodeHandler to receive the auth code,
+        leaving the event loop free to serve other tasks.
+
+        Since code handlers run on an executor thread, pressing ^C does not
+        skip to the next code handler as it does for NativeClient.login().
+        Use code handlers which time out, or cancel the login by other means.
+        """
+        return await self.run(self.native_client.login, *args, **kwargs)
+
+    async def _load_tokens(self, requested_scopes, expiry_margin):
+        """
+        Internal. Like NativeClient._load_tokens(), but returns valid cached
+        tokens on the event loop, only using the executor to read storage or
+        refresh tokens.
+        """
+        loaded = self.native_client._peek_tokens(requested_scopes,
+                                                 expiry_margin)
+        if loaded is None:
+            loaded = await self.run(self.native_client._load_tokens,
+                                    requested_scopes, expiry_margin)
+        return loaded
+
+    async def load_tokens(self, requested_scopes: List[str] = None,
+                          expiry_margin: int = None
+                          ) -> Mapping[str, Mapping]:
+        """Like NativeClient.load_tokens()"""
+        tokens, _ = await self._load_tokens(requested_scopes, expiry_margin)
+        return {rs: dict(ts) for rs, ts in tokens.items()}
+
+    async def load_tokens_by_scope(self, requested_scopes: List[str] = None,
+                                   expiry_margin: int = None):
+        """Like NativeClient.load_tokens_by_scope()"""
+        tokens, scope_index = await self._load_tokens(requested_scopes,
+                                                      expiry_margin)
+        return self.native_client._by_scope(
+            {rs: dict(ts) for rs, ts in tokens.items()}, scope_index)
+
+    async def get_authorizers(self, requested_scopes: List[str] = None,
+                              expiry_margin: int = None):
+        """Like NativeClient.get_authorizers()"""
+        tokens, _ = await self._load_tokens(requested_scopes, expiry_margin)
+        return self.native_client._get_shared_authorizers(tokens)
+
+    async def get_authorizers_by_scope(self,
+                                       requested_scopes: List[str] = None,
+                                       expiry_margin: int = None):
+        """Like NativeClient.get_authorizers_by_scope()"""
+        tokens, scope_index = await self._load_tokens(requested_scopes,
+                                                      expiry_margin)
+        return self.native_client._by_scope(
+            self.native_client._get_shared_authorizers(tokens), scope_index)
+
+    async def save_tokens(self, tokens: Mapping[str, Mapping]):
+        """Like NativeClient.save_tokens()"""
+        return await self.run(self.native_client.save_tokens, tokens)
+
+    async def refresh_tokens(self, tokens, margin=0):
+        """
+        Like NativeClient.refresh_tokens(), but refreshes tokens for all
+        resource servers concurrently regardless of ``max_workers``.
+        """
+        self.native_client._check_refreshable(tokens)
+        results = await asyncio.gather(*[
+            self.run(self.native_client._refresh_token_group, rs, ts,
+                     margin=margin)
+            for rs, ts in tokens.items()
+        ])
+        return self.native_client._check_refreshed(tokens, results)
+
+    async def revoke_token_set(self, tokens):
+        """
+        Like NativeClient.revoke_token_set(), but revokes all tokens
+        concurrently regardless of ``max_workers``.
+        """
+        revocable = self.native_client.get_revocable(tokens)
+        results = await asyncio.gather(*[
+            self.run(self.native_client._revoke_token, token)
+            for token in revocable.values()
+        ])
+        self.native_client._check_revoked(revocable, results)
+
+    async def logout(self):
+        """Like NativeClient.logout(), revoking tokens concurrently"""
+        tokens = await self.run(self.native_client._load_raw_tokens)
+        try:
+            await self.revoke_token_set(tokens)
+        finally:
+            await self.run(self.native_client._clear_tokens)
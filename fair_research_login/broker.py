@@ -0,0 +1,379 @@
+"""
+A local token broker, which owns token storage and refreshes for any number
+of clients, and serves tokens to worker processes over a Unix domain socket.
+Run one with:
+
+    python -m fair_research_login.broker [--socket PATH] [--filename PATH]
+"""
+import argparse
+import json
+import logging
+import os
+import socket
+import socketserver
+import stat
+import tempfile
+import threading
+
+from fair_research_login.client import NativeClient
+from fair_research_login.exc import BrokerError, TokensExpired
+from fair_research_login.token_storage import (
+    MultiClientTokenStorage, TokenCache, is_expired, verify_token_group
+)
+
+log = logging.getLogger(__name__)
+
+DEFAULT_SOCKET = os.path.expanduser('~/.globus-native-apps.sock')
+
+
+class _BrokerRequestHandler(socketserver.StreamRequestHandler):
+    """
+    Handles one worker connection. Requests and responses are JSON objects,
+    one per line, and a connection may send any number of requests.
+    """
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                response = self.server.broker.handle(json.loads(line))
+            except Exception as e:
+                log.debug('Broker request failed: {}'.format(e))
+                response = {'error': '{}: {}'.format(type(e).__name__, e)}
+            self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+
+class _BrokerServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, broker, socket_path):
+        self.broker = broker
+        super(_BrokerServer, self).__init__(socket_path,
+                                            _BrokerRequestHandler)
+
+
+class TokenBroker(object):
+    """
+    A long running service which keeps tokens for many clients in one token
+    storage, refreshes them as they near expiration, and hands them to
+    worker processes through a Unix domain socket. Workers use
+    BrokerTokenStorage, so tokens are refreshed once by the broker rather
+    than by every worker, and lookups are served from memory.
+
+    A NativeClient is created for each client_id on first use, with
+    ``storage_factory()`` as its token storage and a token cache shared by
+    all clients. Tokens which expire within ``margin`` seconds are refreshed
+    before being returned, so workers always receive tokens with at least
+    that much time left when they can be refreshed. Refresh tokens which
+    Globus Auth rejects are not retried until new tokens are saved for
+    their resource server. The broker cannot log users in, tokens must first
+    be saved by a login through the broker's storage or by a worker.
+
+    The socket is only readable and writable by the user running the
+    broker.
+
+    .. code-block:: python
+
+        broker = TokenBroker()
+        broker.serve_forever()
+
+    :param socket_path: Path of the Unix domain socket to listen on
+    :param storage_factory: Called with no arguments to create token storage
+        for each client. Storage must define ``set_client_id()``, unless
+        only a single client will be used.
+    :param margin: Seconds before expiration tokens are refreshed
+    :param client_kwargs: Additional arguments for each NativeClient, such
+        as ``metrics`` or ``max_workers``
+    """
+
+    def __init__(self, socket_path=None,
+                 storage_factory=MultiClientTokenStorage, margin=60,
+                 **client_kwargs):
+        self.socket_path = socket_path or DEFAULT_SOCKET
+        self.storage_factory = storage_factory
+        self.margin = margin
+        self.client_kwargs = client_kwargs
+        self.client_kwargs.setdefault('token_cache', TokenCache())
+        self.clients = {}
+        self._clients_lock = threading.Lock()
+        # (client_id, resource_server) -> refresh token which was rejected
+        self._rejected = {}
+        self._server = None
+        self._thread = None
+
+    def get_client(self, client_id):
+        """Return the NativeClient for ``client_id``, creating it if needed."""
+        if not client_id:
+            raise BrokerError('A client_id is required')
+        with self._clients_lock:
+            if client_id not in self.clients:
+                self.clients[client_id] = NativeClient(
+                    client_id=client_id, token_storage=self.storage_factory(),
+                    code_handlers=(), **self.client_kwargs)
+            return self.clients[client_id]
+
+    def read_tokens(self, client_id):
+        """
+        Return saved tokens for ``client_id``, first refreshing any which
+        expire within ``margin`` seconds. Tokens which fail to refresh are
+        returned as they are, so workers see why they cannot be used.
+        """
+        client = self.get_client(client_id)
+        tokens = client._load_token_groups()
+        due = {rs: ts for rs, ts in client.get_refreshable(tokens).items()
+               if is_expired(ts, self.margin) and
+               self._rejected.get((client_id, rs)) != ts['refresh_token']}
+        if due:
+            try:
+                tokens.update(client._refresh_expired(due,
+                                                      margin=self.margin))
+            except TokensExpired as te:
+                log.warning('Broker failed to refresh tokens for {}, they '
+                            'will not be retried until new tokens are saved: '
+                            '{}'.format(client_id, te))
+                for rs in te.resource_servers:
+                    self._rejected[client_id, rs] = due[rs]['refresh_token']
+                tokens = client._load_token_groups()
+        return {rs: dict(ts) for rs, ts in tokens.items()}
+
+    def write_tokens(self, client_id, tokens):
+        client = self.get_client(client_id)
+        tokens = {rs: verify_token_group(ts) for rs, ts in tokens.items()}
+        with client._storage_lock.exclusive():
+            try:
+                client.token_storage.write_tokens(tokens)
+            finally:
+                client._invalidate_cache()
+
+    def update_tokens(self, client_id, tokens):
+        self.get_client(client_id).save_tokens(tokens)
+
+    def clear_tokens(self, client_id):
+        self.get_client(client_id)._clear_tokens()
+
+    def handle(self, request):
+        """
+        Handle one request from a worker and return the response. Requests
+        have an ``op`` of ``read``, ``write``, ``update``, ``clear`` or
+        ``ping``, a ``client_id``, and ``tokens`` for writes.
+        """
+        op, client_id = request.get('op'), request.get('client_id')
+        if op == 'ping':
+            return {}
+        elif op == 'read':
+            return {'tokens': self.read_tokens(client_id)}
+        elif op == 'write':
+            self.write_tokens(client_id, request['tokens'])
+        elif op == 'update':
+            self.update_tokens(client_id, request['tokens'])
+        elif op == 'clear':
+            self.clear_tokens(client_id)
+        else:
+            raise BrokerError('Unknown operation {!r}'.format(op))
+        return {}
+
+    def bind(self):
+        """
+        Listen on the socket, replacing a stale socket left by a broker
+        which did not shut down cleanly.
+        """
+        if os.path.exists(self.socket_path):
+            if not stat.S_ISSOCK(os.stat(self.socket_path).st_mode):
+                raise BrokerError('{} exists and is not a socket'
+                                  ''.format(self.socket_path))
+            if self.is_running():
+                raise BrokerError('A token broker is already listening on '
+                                  '{}'.format(self.socket_path))
+            os.unlink(self.socket_path)
+        # Bind in a private directory and restrict the socket before moving
+        # it into place, so other users can never connect to it.
+        directory = tempfile.mkdtemp(prefix='.broker-', dir=os.path.dirname(
+            os.path.abspath(self.socket_path)))
+        private_path = os.path.join(directory, 'sock')
+        try:
+            server = _BrokerServer(self, private_path)
+            try:
+                os.chmod(private_path, stat.S_IRUSR | stat.S_IWUSR)
+                os.rename(private_path, self.socket_path)
+            except OSError:
+                server.server_close()
+                raise
+        finally:
+            if os.path.exists(private_path):
+                os.unlink(private_path)
+            os.rmdir(directory)
+        self._server = server
+        return self._server
+
+    def is_running(self):
+        """Returns True if a broker is accepting connections on the socket."""
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.socket_path)
+            return True
+        except OSError:
+            return False
+        finally:
+            sock.close()
+
+    def serve_forever(self):
+        """Serve workers until shutdown() is called."""
+        server = self._server or self.bind()
+        try:
+            server.serve_forever()
+        finally:
+            self.close()
+
+    def start(self):
+        """Serve workers from a daemon thread, and return the thread."""
+        self.bind()
+        self._thread = threading.Thread(target=self.serve_forever,
+                                        name='TokenBroker', daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def shutdown(self):
+        """Stop serving workers, and remove the socket."""
+        if self._server is not None:
+            self._server.shutdown()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.close()
+
+    def close(self):
+        server, self._server = self._server, None
+        if server is None:
+            return
+        server.server_close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+class BrokerTokenStorage(object):
+    """
+    Token storage which reads and writes tokens through a TokenBroker,
+    for use by worker processes. Tokens which expire within the broker's
+    ``margin`` are refreshed by the broker when they are read, so a read may
+    wait for that refresh. Authorizers created from these tokens may still
+    refresh them in the worker if they expire while in use, and the new
+    tokens are saved through the broker. One connection is kept open for
+    each thread, and reopened after a fork or a lost connection.
+
+    Tokens are read from the broker on every load, even if the NativeClient
+    has a token cache, since the broker may have refreshed them.
+
+    .. code-block:: python
+
+        cli = NativeClient(client_id='my_id',
+                           token_storage=BrokerTokenStorage())
+        authorizers = cli.get_authorizers()
+
+    :param socket_path: Path of the broker's Unix domain socket
+    :param client_id: The client tokens are stored for. Set automatically
+        when used by a NativeClient.
+    :param timeout: Seconds to wait for the broker to reply
+    """
+    TIMEOUT = 30
+
+    def __init__(self, socket_path=None, client_id=None, timeout=None):
+        self.socket_path = socket_path or DEFAULT_SOCKET
+        self.client_id = client_id
+        self.timeout = timeout or self.TIMEOUT
+        self._local = threading.local()
+
+    def set_client_id(self, client_id):
+        self.client_id = client_id
+
+    def cache_stamp(self):
+        """
+        Used by TokenCache. A new stamp is returned each time, since this
+        process cannot tell when the broker has refreshed tokens.
+        """
+        return object()
+
+    def connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError as e:
+            sock.close()
+            raise BrokerError('Unable to connect to token broker at {}: {}'
+                              ''.format(self.socket_path, e))
+        self._local.conn = sock, sock.makefile('rb')
+        self._local.pid = os.getpid()
+        return self._local.conn
+
+    def close(self):
+        """Close this thread's connection to the broker."""
+        conn = getattr(self._local, 'conn', None)
+        self._local.conn = None
+        if conn is not None:
+            conn[1].close()
+            conn[0].close()
+
+    def request(self, op, **kwargs):
+        """Send a request to the broker, and return its response."""
+        message = dict(op=op, client_id=self.client_id, **kwargs)
+        data = json.dumps(message).encode('utf-8') + b'\n'
+        for _ in range(2):
+            sock, rfile = self.connect()
+            try:
+                sock.sendall(data)
+                line = rfile.readline()
+            except OSError:
+                line = b''
+            if line:
+                break
+            # The broker may have restarted since the connection was opened
+            self.close()
+        else:
+            raise BrokerError('Lost connection to token broker at {}'
+                              ''.format(self.socket_path))
+        response = json.loads(line)
+        if 'error' in response:
+            raise BrokerError(response['error'])
+        return response
+
+    def read_tokens(self):
+        return self.request('read')['tokens']
+
+    def write_tokens(self, tokens):
+        self.request('write', tokens=tokens)
+
+    def update_tokens(self, tokens):
+        """Merge tokens into those kept by the broker."""
+        self.request('update', tokens=tokens)
+
+    def clear_tokens(self):
+        self.request('clear')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--socket', dest='socket_path',
+                        help='Unix domain socket to listen on (Default {})'
+                             ''.format(DEFAULT_SOCKET))
+    parser.add_argument('--filename', help='Token storage file (Default {})'
+                        ''.format(MultiClientTokenStorage.DEFAULT_FILENAME))
+    parser.add_argument('--margin', type=int, default=60,
+                        help='Seconds before expiration to refresh tokens')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    broker = TokenBroker(
+        socket_path=args.socket_path, margin=args.margin,
+        storage_factory=lambda: MultiClientTokenStorage(
+            filename=args.filename, atomic=True))
+    log.info('Serving tokens on {}'.format(broker.socket_path))
+    try:
+        broker.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -1,22 +1,40 @@
 import logging
-import globus_sdk
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from contextlib import nullcontext
 
-from typing import List, Mapping, Union
-from fair_research_login.code_handler import InputCodeHandler
-from fair_research_login.local_server import LocalServerCodeHandler
+from typing import List, Mapping, Union, TYPE_CHECKING
+from urllib.parse import quote
 from fair_research_login.token_storage import (
-    MultiClientTokenStorage, check_expired, check_scopes,
-    verify_token_group, get_scopes
+    MultiClientTokenStorage, TokenCache, check_expired, check_scopes,
+    verify_token_group, get_scope_index, is_expired, TokenGroup
 )
+from fair_research_login.token_storage.locking import file_lock, ReadWriteLock
+from fair_research_login.refresher import TokenRefresher
 from fair_research_login.exc import (
-    LoadError, TokensExpired, TokenStorageDisabled, NoSavedTokens, AuthFailure
+    LoadError, TokensExpired, TokenStorageDisabled, NoSavedTokens, AuthFailure,
+    RevocationFailed, ScopesMismatch
 )
 
+if TYPE_CHECKING:  # pragma: no cover
+    import globus_sdk
+
 log = logging.getLogger(__name__)
 
 
-sdk_authorizer = Union[globus_sdk.AccessTokenAuthorizer,
-                       globus_sdk.RefreshTokenAuthorizer]
+sdk_authorizer = Union['globus_sdk.AccessTokenAuthorizer',
+                       'globus_sdk.RefreshTokenAuthorizer']
+
+
+class _Default(object):
+    """Placeholder for arguments with a default created by each client"""
+
+    def __repr__(self):
+        return 'DEFAULT'
+
+
+DEFAULT = _Default()
 
 
 class NativeClient(object):
@@ -34,6 +52,17 @@ class NativeClient(object):
         cli = NativeClient(client_id='my_id', app_name='my cool app')
         cli.login(requested_scopes=['openid', 'profile', 'email'])
 
+    A single client may be shared by many threads. Saving and clearing
+    tokens, including saves by authorizers after they refresh, hold an
+    exclusive lock for the client while reads from storage may happen
+    concurrently. Expired tokens are refreshed by one thread at a time, and
+    other threads use the tokens it saved. The token storage object should
+    only be used through the client. login() should only be called by one
+    thread at a time, and whether it opens a browser is a setting shared by
+    the whole process, see
+    :meth:`CodeHandler.set_browser_enabled \
+    <fair_research_login.code_handler.CodeHandler.set_browser_enabled>`.
+
     :param client_id: The id for your app. Register one at
       https://developers.globus.org
     :type client_id: str
@@ -73,8 +102,13 @@ class NativeClient(object):
 
         A default token storage object is provided
         at fair_research_login.token_storage.MultiClientTokenStorage, which
-        saves tokens in a section named by your clients ``client_id``. None
-        may be used to disable token storage.
+        saves tokens in a section named by your clients ``client_id``. Each
+        client creates its own default storage object. None may be used to
+        disable token storage.
+
+        Storage may optionally define update_tokens(tokens), which merges
+        ``tokens`` into the saved tokens. If present, save_tokens() uses it
+        instead of reading the saved tokens itself and writing them all back.
     :type token_storage: TokenStorage
     :param code_handlers: (*list* of :class:`CodeHandler \
         <fair_research_login.code_handler.CodeHandler>`)
@@ -83,39 +117,161 @@ class NativeClient(object):
         Code handlers are executed in the order they appear in the list, and
         may be skipped by users with ^C or if they cannot be run (Local
         Server Code Handler cannot run on remote servers, for example).
+        Defaults to a LocalServerCodeHandler followed by an InputCodeHandler,
+        which are created the first time a login needs them.
     :type code_handlers:
+    :param max_workers: The number of threads used to refresh expired
+        tokens. With the default of 1, tokens for each resource server are
+        refreshed one after another. Larger values issue refresh grants for
+        all resource servers concurrently, which helps apps with many
+        resource servers start faster.
+    :type max_workers: int
+    :param token_cache: Keep verified tokens in memory so repeated calls to
+        load_tokens() or get_authorizers() do not re-read token storage. Pass
+        True to give this client its own cache, or a
+        :class:`TokenCache <fair_research_login.token_storage.TokenCache>`
+        to share one between clients. Cached tokens are dropped on
+        save_tokens(), logout(), or when the storage file changes on disk.
+        Disabled by default.
+    :type token_cache: bool or TokenCache
+    :param expiry_margin: Treat tokens which expire within this many seconds
+        as already expired, so load_tokens() refreshes them instead of
+        returning tokens which may expire before they are used. Defaults
+        to 0. May be overridden for each call to load_tokens().
+    :type expiry_margin: int
+    :param metrics: Report durations and counts for storage access,
+        refreshes, revocations, the token cache and code handlers to a
+        :class:`Metrics <fair_research_login.metrics.Metrics>` object.
+        Disabled by default.
+    :type metrics: Metrics
+    :param pool_size: The number of connections to Globus Auth kept open for
+        reuse, so refreshes and revocations skip a new TLS handshake. All
+        authorizers from this client share the same connections. Defaults
+        to ``max_workers``, or 10 if that is smaller. Retries and timeouts
+        are set through the Globus SDK, for example with
+        ``transport_params={'max_retries': 5, 'http_timeout': 30}``.
+    :type pool_size: int
     """
 
     TOKEN_STORAGE_ATTRS = {'write_tokens', 'read_tokens', 'clear_tokens'}
+    DEFAULT_POOL_SIZE = 10
 
-    def __init__(self, token_storage=MultiClientTokenStorage(),
+    def __init__(self, token_storage=DEFAULT,
                  local_server_code_handler=None,
                  secondary_code_handler=None,
-                 code_handlers=(LocalServerCodeHandler(), InputCodeHandler()),
+                 code_handlers=DEFAULT,
                  default_scopes=None,
-                 *args, **kwargs):
-        self.client = globus_sdk.NativeAppAuthClient(*args, **kwargs)
+                 *args, max_workers=1, token_cache=None, expiry_margin=0,
+                 metrics=None, pool_size=None, **kwargs):
+        # The SDK client is created on first use, see the client property
+        self._client = None
+        # Guards creating the SDK client and default code handlers
+        self._init_lock = threading.Lock()
+        # Saves and clears are exclusive, reads from storage are shared
+        self._storage_lock = ReadWriteLock()
+        self._client_args = args, kwargs
+        if token_storage is DEFAULT:
+            token_storage = MultiClientTokenStorage()
         self.token_storage = token_storage
         if token_storage is not None:
             self.verify_token_storage(self.token_storage)
         self.app_name = kwargs.get('app_name') or 'My App'
+        # Default code handlers are created on first use, see code_handlers
+        self._code_handlers = None
         if local_server_code_handler or secondary_code_handler:
             log.warning('Specifying "local_server_code_handler" or '
                         '"code_handler" will be removed. Instead, specify '
                         'handlers in a list with keyword "code_handlers"')
+            default_local, default_input = self.get_default_code_handlers()
             self.code_handlers = [
-                    local_server_code_handler or LocalServerCodeHandler(),
-                    secondary_code_handler or InputCodeHandler()
+                    local_server_code_handler or default_local,
+                    secondary_code_handler or default_input
                 ]
-        else:
+        elif code_handlers is not DEFAULT:
             self.code_handlers = code_handlers
-        log.debug('Using code handlers {}'.format(self.code_handlers))
-        if isinstance(self.token_storage, MultiClientTokenStorage):
+        # Multi-client storage keeps tokens separately for each client_id
+        if hasattr(self.token_storage, 'set_client_id'):
             self.token_storage.set_client_id(kwargs.get('client_id'))
         log.debug('Token storage set to {}'.format(self.token_storage))
+        self.default_scopes = default_scopes
+        self.max_workers = max_workers
+        self.expiry_margin = expiry_margin
+        if token_cache is True:
+            token_cache = TokenCache()
+        self.token_cache = token_cache or None
+        self.metrics = metrics
+        self.pool_size = pool_size
+        self._refresh_lock = threading.Lock()
+        # resource_server -> (access_token, refresh_token, authorizer)
+        self._authorizers = {}
+        self._authorizers_lock = threading.Lock()
+        self._refresher = None
+        self._refresher_lock = threading.Lock()
+
+    @property
+    def client(self):
+        """
+        The globus_sdk.NativeAppAuthClient used for logins, refreshes and
+        revocations. The Globus SDK is imported and the client created the
+        first time it is needed, so loading valid tokens from storage does
+        not pay for either.
+        """
+        if self._client is None:
+            import globus_sdk
+            with self._init_lock:
+                if self._client is None:
+                    args, kwargs = self._client_args
+                    client = globus_sdk.NativeAppAuthClient(*args, **kwargs)
+                    self._mount_connection_pool(client)
+                    self._client = client
+        return self._client
+
+    @client.setter
+    def client(self, value):
+        self._client = value
+
+    def _mount_connection_pool(self, client):
+        """
+        Internal. Size the pool of keep-alive connections in the SDK client's
+        requests session, which is used for every exchange, refresh and
+        revocation, including those made by authorizers from this client.
+        """
+        from requests.adapters import HTTPAdapter
+        # The session belongs to the transport in Globus SDK v3, and to the
+        # client itself in v2.
+        session = getattr(getattr(client, 'transport', None), 'session',
+                          getattr(client, '_session', None))
+        if session is None:
+            return
+        adapter = HTTPAdapter(pool_maxsize=self.pool_size or max(
+            self.max_workers, self.DEFAULT_POOL_SIZE))
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+
+    @property
+    def code_handlers(self):
+        """
+        Code handlers used by login(). If none were given, the default
+        handlers are created the first time they are needed.
+        """
+        if self._code_handlers is None:
+            with self._init_lock:
+                if self._code_handlers is None:
+                    self._code_handlers = self.get_default_code_handlers()
+        return self._code_handlers
+
+    @code_handlers.setter
+    def code_handlers(self, value):
+        log.debug('Using code handlers {}'.format(value))
+        self._code_handlers = value
+
+    @staticmethod
+    def get_default_code_handlers():
+        from fair_research_login.code_handler import InputCodeHandler
+        from fair_research_login.local_server import LocalServerCodeHandler
         log.debug('Automatically open browser: {}'
                   ''.format(InputCodeHandler.is_browser_enabled()))
-        self.default_scopes = default_scopes
+        return LocalServerCodeHandler(), InputCodeHandler()
 
     def login(self,
               requested_scopes: List[str] = None,
@@ -188,7 +344,9 @@ class NativeClient(object):
         auth_code = self.get_code(requested_scopes, refresh_tokens,
                                   prefill_named_grant, query_params,
                                   **kwargs)
-        token_response = self.client.oauth2_exchange_code_for_tokens(auth_code)
+        with self._timer('token_exchange'):
+            token_response = self.client.oauth2_exchange_code_for_tokens(
+                auth_code)
         try:
             self.save_tokens(token_response.by_resource_server)
         except TokenStorageDisabled:
@@ -230,7 +388,9 @@ class NativeClient(object):
                 )
 
                 try:
-                    auth_code = ch.authenticate(url=auth_url)
+                    with self._timer('code_handler_wait',
+                                     handler=type(ch).__name__):
+                        auth_code = ch.authenticate(url=auth_url)
                     if auth_code:
                         log.debug('Retrieval of auth code successful!')
                         return auth_code
@@ -276,23 +436,82 @@ class NativeClient(object):
             raise TokenStorageDisabled()
 
         new_tokens = {rs: verify_token_group(ts) for rs, ts in tokens.items()}
-        original_tks = {rs: verify_token_group(ts)
-                        for rs, ts, in self._load_raw_tokens().items()}
+        with self._storage_lock.exclusive():
+            try:
+                return self._merge_tokens(new_tokens)
+            finally:
+                self._invalidate_cache()
+
+    def _merge_tokens(self, new_tokens):
+        """
+        Internal. Merge new_tokens into storage, in a single read-modify-write
+        if the storage defines update_tokens().
+        """
+        update_tokens = getattr(self.token_storage, 'update_tokens', None)
+        if update_tokens is not None:
+            with self._timer('storage_write'):
+                return update_tokens(new_tokens)
+        original_tks = {rs: ts.to_dict()
+                        for rs, ts in self._load_token_groups().items()}
         original_tks.update(new_tokens)
-        return self.token_storage.write_tokens(original_tks)
+        with self._timer('storage_write'):
+            return self.token_storage.write_tokens(original_tks)
 
     def _load_raw_tokens(self):
         """
         Loads tokens without checking whether they have expired. Sorts them by
         expiration time.
         """
+        with self._storage_lock.shared():
+            return self._read_storage()
+
+    def _read_storage(self):
+        """Internal. Read tokens from storage, the caller holds the lock."""
         if self.token_storage is not None:
-            return self.token_storage.read_tokens() or {}
+            with self._timer('storage_read'):
+                return self.token_storage.read_tokens() or {}
         raise TokenStorageDisabled('No token_storage set on client.')
 
+    def _load_token_groups(self):
+        """
+        Loads tokens as validated, immutable TokenGroups, using the token
+        cache if one is set. Tokens are not checked for expiration.
+        """
+        return dict(self._load_indexed_tokens()[0])
+
+    def _load_indexed_tokens(self):
+        """
+        Loads TokenGroups along with a scope index built by
+        get_scope_index(). Both are cached together if a token cache is set,
+        and must not be modified.
+        """
+        misses = []
+
+        def load():
+            misses.append(True)
+            raw_tokens = self._read_storage()
+            with self._timer('token_validation'):
+                groups = {rs: TokenGroup.from_dict(ts)
+                          for rs, ts in raw_tokens.items()}
+                return groups, get_scope_index(groups)
+
+        # Tokens are cached under the same lock as they are read, so a save
+        # cannot invalidate the cache between reading and caching them.
+        with self._storage_lock.shared():
+            if self.token_cache is None or self.token_storage is None:
+                return load()
+            loaded = self.token_cache.load(self.token_storage, load)
+        self._increment('cache_misses' if misses else 'cache_hits')
+        return loaded
+
+    def _invalidate_cache(self):
+        if self.token_cache is not None:
+            self.token_cache.invalidate(self.token_storage)
+
     def load_tokens(
         self,
-        requested_scopes: List[str] = None
+        requested_scopes: List[str] = None,
+        expiry_margin: int = None,
     ) -> Mapping[str, Mapping]:
         """
         Load saved tokens and return them keyed by resource server. If no
@@ -308,6 +527,9 @@ class NativeClient(object):
         :param requested_scopes: A list of scopes which must be successfully
           loaded, or a ScopesMismatch error will be raised
         :type: list
+        :param expiry_margin: Tokens which expire within this many seconds
+          are treated as expired. Defaults to the client ``expiry_margin``.
+        :type: int
         :returns: A dict of token dicts, each containing a dict defined by
            globus_sdk.auth.token_response.OAuthTokenResponse\
            .by_resource_server
@@ -336,26 +558,73 @@ class NativeClient(object):
         :raises fair_research_login.exc.ScopesMismatch: If
             any requested_scopes are missing
         """
-        tokens = {rs: verify_token_group(ts) for rs, ts in
-                  self._load_raw_tokens().items()}
+        tokens, _ = self._load_tokens(requested_scopes, expiry_margin)
+        return {rs: dict(ts) for rs, ts in tokens.items()}
+
+    def _load_tokens(self, requested_scopes, expiry_margin):
+        """
+        Internal. Does the work for load_tokens(), returning token groups
+        along with the scope index for all saved tokens.
+        """
+        with self._timer('load_tokens'):
+            return self._load_and_refresh(requested_scopes, expiry_margin)
+
+    def _peek_tokens(self, requested_scopes, expiry_margin):
+        """
+        Internal. Like _load_tokens(), but only returns tokens held by the
+        token cache which do not need refreshing, without reading storage or
+        taking the storage lock. Returns None if tokens must be loaded, in
+        which case _load_tokens() also raises any errors.
+        """
+        if self.token_cache is None or self.token_storage is None:
+            return None
+        cached = self.token_cache.peek(self.token_storage)
+        if not cached or not cached[0]:
+            return None
+        tokens, scope_index = cached
+        try:
+            tokens = self._select_tokens(tokens, scope_index,
+                                         requested_scopes)
+        except ScopesMismatch:
+            return None
+        if expiry_margin is None:
+            expiry_margin = self.expiry_margin
+        if any(is_expired(ts, expiry_margin) for ts in tokens.values()):
+            return None
+        self._increment('cache_hits')
+        return tokens, scope_index
+
+    def _select_tokens(self, tokens, scope_index, requested_scopes):
+        """
+        Internal. Return only the tokens for ``requested_scopes``, raising
+        ScopesMismatch if any are missing, or all tokens if none were
+        requested.
+        """
+        if not requested_scopes:
+            return tokens
+        # Support both string and list for requested scope. But ensure
+        # it is a list.
+        if isinstance(requested_scopes, str):
+            requested_scopes = requested_scopes.split(' ')
+        requested_scopes = set(requested_scopes)
+        # Ensure all requested tokens are present.
+        check_scopes(tokens, requested_scopes, scope_index=scope_index)
+        # Ensure only requested tokens are used.
+        return {scope_index[scope]: tokens[scope_index[scope]]
+                for scope in requested_scopes}
+
+    def _load_and_refresh(self, requested_scopes, expiry_margin):
+        tokens, scope_index = self._load_indexed_tokens()
 
         if not tokens:
             raise NoSavedTokens('No tokens were loaded')
 
-        if requested_scopes:
-            # Support both string and list for requested scope. But ensure
-            # it is a list.
-            if isinstance(requested_scopes, str):
-                requested_scopes = requested_scopes.split(' ')
-            requested_scopes = set(requested_scopes)
-            # Ensure only requested tokens are used.
-            tokens = {rs: ts for rs, ts in tokens.items()
-                      if requested_scopes.intersection(ts['scope'].split())}
-            # Ensure all requested tokens are present.
-            check_scopes(tokens, requested_scopes)
+        tokens = self._select_tokens(tokens, scope_index, requested_scopes)
 
+        if expiry_margin is None:
+            expiry_margin = self.expiry_margin
         try:
-            check_expired(tokens)
+            check_expired(tokens, margin=expiry_margin)
         except TokensExpired as te:
             expired = {rs: tokens[rs] for rs in te.resource_servers}
             # If the user requested scopes, one of their scopes expired by this
@@ -364,8 +633,7 @@ class NativeClient(object):
                 raise
             # At this point, scopes expired but either were refreshable, or
             # the user didn't specify.
-            refreshed = self.refresh_tokens(self.get_refreshable(expired))
-            self.save_tokens(refreshed)
+            refreshed = self._refresh_expired(expired, margin=expiry_margin)
             unexpired = {rs: ts for rs, ts in tokens.items()
                          if rs not in expired}
             unexpired.update(refreshed)
@@ -373,7 +641,62 @@ class NativeClient(object):
             if not tokens:
                 raise
 
-        return tokens
+        return tokens, scope_index
+
+    def _refresh_expired(self, expired, margin=0):
+        """
+        Internal. Refresh all refreshable tokens in ``expired`` and save them
+        with a single call to save_tokens(). Tokens which were refreshed are
+        saved even if others failed, before TokensExpired is raised.
+
+        Only one thread in this process, and one process sharing the same
+        token storage file, refreshes at a time. Others wait, then use the
+        tokens it saved rather than refreshing them again.
+        """
+        with self._refresh_lock, self._get_storage_refresh_lock():
+            saved = self._load_token_groups()
+            fresh = {rs: saved[rs] for rs in expired
+                     if rs in saved and not is_expired(saved[rs], margin)}
+            if fresh:
+                log.debug('Using tokens refreshed elsewhere for {}'
+                          ''.format(', '.join(fresh)))
+            stale = {rs: ts for rs, ts in expired.items() if rs not in fresh}
+            fresh.update(self._refresh_and_save(stale, margin))
+        return fresh
+
+    def _refresh_and_save(self, expired, margin=0):
+        # refresh_tokens() updates token dicts in place, so use copies
+        refreshable = {rs: dict(ts)
+                       for rs, ts in self.get_refreshable(expired).items()}
+        if not refreshable:
+            return {}
+        try:
+            refreshed = self.refresh_tokens(refreshable, margin=margin)
+        except TokensExpired as te:
+            refreshed = {rs: ts for rs, ts in refreshable.items()
+                         if rs not in te.resource_servers}
+            if refreshed:
+                self.save_tokens(refreshed)
+            raise
+        self.save_tokens(refreshed)
+        return refreshed
+
+    def _get_storage_refresh_lock(self):
+        """
+        Internal. A lock shared by all processes using the same token storage
+        file and section, held while refreshing tokens. Clients with their own
+        sections, such as each client_id with MultiClientTokenStorage, refresh
+        independently. Storage without a filename only uses the in-process
+        lock.
+        """
+        filename = getattr(self.token_storage, 'filename', None)
+        if filename is None:
+            return nullcontext()
+        section = getattr(self.token_storage, 'section', None)
+        if section is None:
+            return file_lock('{}.refresh'.format(filename))
+        return file_lock('{}.{}.refresh'.format(filename,
+                                                quote(section, safe='')))
 
     def get_refreshable(self, tokens):
         return {t: ts for t, ts in tokens.items() if bool(ts['refresh_token'])}
@@ -381,7 +704,8 @@ class NativeClient(object):
     def _refreshable(self, tokens):
         return all([bool(ts['refresh_token']) for ts in tokens.values()])
 
-    def load_tokens_by_scope(self, requested_scopes: List[str] = None):
+    def load_tokens_by_scope(self, requested_scopes: List[str] = None,
+                             expiry_margin: int = None):
         """
         Like load_tokens(), but returns a dict keyed by token scopes
         instead of by resource server. If there are multiple scopes requested
@@ -391,6 +715,8 @@ class NativeClient(object):
         :param requested_scopes: A list of scopes which must be successfully
           loaded, or a ScopesMismatch error will be raised
         :type list:
+        :param expiry_margin: Passed to load_tokens()
+        :type int:
         :raises fair_research_login.exc.NoSavedTokens: If no tokens can be
             loaded
         :raises fair_research_login.exc.TokensExpired: If no unexpired
@@ -399,39 +725,103 @@ class NativeClient(object):
         :raises fair_research_login.exc.ScopesMismatch: If requested_scopes
             are missing
         """
-        tokens = self.load_tokens(requested_scopes)
-        token_group = {}
-        for scope in get_scopes(tokens):
-            for tgroup in tokens.values():
-                if scope in tgroup['scope'].split():
-                    token_group[scope] = tgroup
-        return token_group
+        tokens, scope_index = self._load_tokens(requested_scopes,
+                                                expiry_margin)
+        return self._by_scope({rs: dict(ts) for rs, ts in tokens.items()},
+                              scope_index)
 
-    def refresh_tokens(self, tokens):
+    @staticmethod
+    def _by_scope(by_resource_server, scope_index):
+        """
+        Internal. Key values for each resource server by each of its scopes
+        instead.
+        """
+        return {scope: by_resource_server[rs]
+                for scope, rs in scope_index.items()
+                if rs in by_resource_server}
+
+    def refresh_tokens(self, tokens, margin=0):
         """
         Explicitly refresh a token. Called automatically by load_tokens().
+        Tokens are refreshed concurrently if ``max_workers`` is greater than
+        one. All tokens are attempted before a TokensExpired exception is
+        raised, which lists every resource server whose refresh token has
+        expired. Tokens which expire within ``margin`` seconds are treated as
+        expired and refreshed.
         """
+        self._check_refreshable(tokens)
+        refresh = partial(self._refresh_token_group, margin=margin)
+        results = self._map_concurrently(refresh, tokens.keys(),
+                                         tokens.values())
+        return self._check_refreshed(tokens, results)
+
+    def _check_refreshable(self, tokens):
         if not self._refreshable(tokens):
             raise TokensExpired('No Refresh Token, cannot refresh tokens: ',
                                 resource_servers=tokens.keys())
 
-        for rs, token_dict in tokens.items():
-            authorizer = globus_sdk.RefreshTokenAuthorizer(
-                token_dict['refresh_token'],
-                self.client,
-                access_token=token_dict['access_token'],
-                expires_at=token_dict['expires_at_seconds'],
-            )
-            try:
-                authorizer.ensure_valid_token()
-                token_dict['access_token'] = authorizer.access_token
-                token_dict['expires_at_seconds'] = authorizer.expires_at
-            except globus_sdk.AuthAPIError as aapie:
-                if aapie.message == 'invalid_grant':
-                    raise TokensExpired('Refresh Token Expired: ',
-                                        resource_servers=[rs])
+    @staticmethod
+    def _check_refreshed(tokens, results):
+        """
+        Internal. Raise TokensExpired listing every resource server which
+        failed to refresh, given the results of _refresh_token_group() in the
+        same order as ``tokens``.
+        """
+        expired = [rs for rs, success in zip(tokens.keys(), results)
+                   if not success]
+        if expired:
+            raise TokensExpired('Refresh Token Expired: ',
+                                resource_servers=expired)
         return tokens
 
+    def _refresh_token_group(self, resource_server, token_dict, margin=0):
+        """
+        Internal. Refresh a single token group in place. Returns False if
+        the refresh token was rejected with an invalid_grant, True otherwise.
+        """
+        import globus_sdk
+        authorizer = globus_sdk.RefreshTokenAuthorizer(
+            token_dict['refresh_token'],
+            self.client,
+            access_token=token_dict['access_token'],
+            # The authorizer only refreshes tokens it thinks have expired
+            expires_at=token_dict['expires_at_seconds'] - margin,
+        )
+        try:
+            with self._timer('refresh', resource_server=resource_server):
+                authorizer.ensure_valid_token()
+            token_dict['access_token'] = authorizer.access_token
+            token_dict['expires_at_seconds'] = authorizer.expires_at
+        except globus_sdk.AuthAPIError as aapie:
+            if aapie.message == 'invalid_grant':
+                log.debug('Refresh token for {} is no longer valid'
+                          ''.format(resource_server))
+                self._increment('refresh_failures',
+                                resource_server=resource_server)
+                return False
+        return True
+
+    def _timer(self, name, **labels):
+        """Internal. Time a block if metrics are enabled."""
+        if self.metrics is None:
+            return nullcontext()
+        return self.metrics.timer(name, **labels)
+
+    def _increment(self, name, **labels):
+        """Internal. Increment a counter if metrics are enabled."""
+        if self.metrics is not None:
+            self.metrics.increment(name, **labels)
+
+    def _map_concurrently(self, func, *iterables):
+        """
+        Internal. Like map(), but calls func from a pool of up to
+        ``max_workers`` threads. Results are returned in order as a list.
+        """
+        if self.max_workers > 1:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                return list(pool.map(func, *iterables))
+        return list(map(func, *iterables))
+
     def get_authorizer(self, token_dict: Mapping[str, str]
                        ) -> Mapping[str, sdk_authorizer]:
         """
@@ -462,6 +852,7 @@ class NativeClient(object):
         :raises fair_research_login.exc.ScopesMismatch: If requested_scopes
             are missing
         """
+        import globus_sdk
         if token_dict.get('refresh_token') is not None:
             return globus_sdk.RefreshTokenAuthorizer(
                 token_dict['refresh_token'],
@@ -473,7 +864,8 @@ class NativeClient(object):
         else:
             return globus_sdk.AccessTokenAuthorizer(token_dict['access_token'])
 
-    def get_authorizers(self, requested_scopes: List[str] = None
+    def get_authorizers(self, requested_scopes: List[str] = None,
+                        expiry_margin: int = None
                         ) -> Mapping[str, sdk_authorizer]:
         """
         Load tokens and create TokenAuthorizers for them. Automatically
@@ -483,8 +875,12 @@ class NativeClient(object):
         is disabled, no tokens were saved, or if the tokens expired or the
         requested scopes don't match. Calls load_tokens() internally.
 
+        The same authorizer is returned for a resource server on each call
+        until its tokens change, so one authorizer refreshes each token.
+
         :param requested_scopes: A list of scopes which must be successfully
             loaded, or a ScopesMismatch error will be raised
+        :param expiry_margin: Passed to load_tokens()
         :returns: The dict keyed by resource server, with values being
             authorizers. RefreshTokenAuthorizers are preferred if possible
         :raises fair_research_login.exc.NoSavedTokens: If no tokens can be
@@ -495,16 +891,20 @@ class NativeClient(object):
         :raises fair_research_login.exc.ScopesMismatch: If requested_scopes are
             missing
         """
-        tokens = self.load_tokens(requested_scopes=requested_scopes)
-        return {rs: self.get_authorizer(ts) for rs, ts in tokens.items()}
+        tokens = self.load_tokens(requested_scopes=requested_scopes,
+                                  expiry_margin=expiry_margin)
+        return self._get_shared_authorizers(tokens)
 
-    def get_authorizers_by_scope(self, requested_scopes: List[str] = None):
+    def get_authorizers_by_scope(self, requested_scopes: List[str] = None,
+                                 expiry_margin: int = None):
         """
         Like get_authorizers(), but returns a dict keyed by scope rather than
-        by resource server.
+        by resource server. All scopes for a resource server share one
+        authorizer.
 
         :param requested_scopes: A list of scopes which must be successfully
             loaded, or a ScopesMismatch error will be raised
+        :param expiry_margin: Passed to load_tokens()
         :returns: The dict of authorizers keyed by scope, with values being
             authorizers. RefreshTokenAuthorizers are preferred if possible
         :raises fair_research_login.exc.NoSavedTokens: If no tokens can be
@@ -515,14 +915,74 @@ class NativeClient(object):
         :raises fair_research_login.exc.ScopesMismatch: If requested_scopes
             are missing
         """
-        tokens = self.load_tokens_by_scope(requested_scopes)
-        return {scope: self.get_authorizer(tokens)
-                for scope, tokens in tokens.items()}
+        tokens, scope_index = self._load_tokens(requested_scopes,
+                                                expiry_margin)
+        return self._by_scope(self._get_shared_authorizers(tokens),
+                              scope_index)
+
+    def _get_shared_authorizers(self, tokens):
+        return {rs: self._get_shared_authorizer(rs, ts)
+                for rs, ts in tokens.items()}
+
+    def _get_shared_authorizer(self, resource_server, token_dict):
+        """
+        Internal. Return the authorizer last created for ``resource_server``
+        if it holds the same tokens, otherwise create a new one. Authorizers
+        are also reused after refreshing themselves, once their new access
+        token is loaded, so each token group has only one authorizer which
+        may refresh it.
+        """
+        access_token = token_dict['access_token']
+        refresh_token = token_dict.get('refresh_token')
+        with self._authorizers_lock:
+            cached = self._authorizers.get(resource_server)
+            if cached is not None:
+                cached_access, cached_refresh, authorizer = cached
+                if refresh_token == cached_refresh and access_token in (
+                        cached_access, authorizer.access_token):
+                    return authorizer
+            authorizer = self.get_authorizer(token_dict)
+            self._authorizers[resource_server] = (access_token, refresh_token,
+                                                  authorizer)
+            return authorizer
 
     def on_refresh(self, token_response):
-        loaded_tokens = self._load_raw_tokens()
-        loaded_tokens.update(token_response.by_resource_server)
-        self.save_tokens(loaded_tokens)
+        # save_tokens() merges with saved tokens, no need to load them here.
+        self.save_tokens(token_response.by_resource_server)
+
+    def start_refresher(self, margin=300, **kwargs):
+        """
+        Start a background thread which refreshes saved tokens ``margin``
+        seconds before they expire and saves them to token storage, keeping
+        token refreshes out of the path of callers of load_tokens() or
+        get_authorizers(). Any running refresher is stopped first. Additional
+        ``kwargs`` are passed to
+        :class:`TokenRefresher <fair_research_login.refresher.TokenRefresher>`.
+
+        :param margin: Seconds before expiration to refresh tokens
+        :type int:
+        :returns: The started TokenRefresher
+        :raises fair_research_login.exc.TokenStorageDisabled: If no
+            token_storage is set
+        """
+        if self.token_storage is None:
+            raise TokenStorageDisabled('Background refresh requires '
+                                       'token_storage to be set.')
+        with self._refresher_lock:
+            self._stop_refresher()
+            self._refresher = TokenRefresher(self, margin=margin, **kwargs)
+            self._refresher.start()
+            return self._refresher
+
+    def stop_refresher(self):
+        """Stop the background refresher, if one was started."""
+        with self._refresher_lock:
+            self._stop_refresher()
+
+    def _stop_refresher(self):
+        if self._refresher is not None:
+            self._refresher.stop()
+            self._refresher = None
 
     def logout(self):
         """
@@ -530,11 +990,28 @@ class NativeClient(object):
         fair_research_login.exc.TokenStorageDisabled if no token storage is
         set, otherwise attempts to revoke tokens then returns None.
 
+        Tokens are cleared from storage even if some could not be revoked,
+        after which RevocationFailed is raised.
+
         Clients NOT using token storage should use 'revoke_token_set' instead
         to revoke tokens.
         """
-        self.revoke_token_set(self._load_raw_tokens())
-        self.token_storage.clear_tokens()
+        tokens = self._load_raw_tokens()
+        try:
+            self.revoke_token_set(tokens)
+        finally:
+            self._clear_tokens()
+
+    def _clear_tokens(self):
+        """Internal. Clear storage, cached tokens and authorizers."""
+        with self._storage_lock.exclusive():
+            try:
+                with self._timer('storage_clear'):
+                    self.token_storage.clear_tokens()
+            finally:
+                self._invalidate_cache()
+        with self._authorizers_lock:
+            self._authorizers.clear()
 
     def revoke_token_set(self, tokens):
         """
@@ -556,7 +1033,55 @@ class NativeClient(object):
                     "resource_server": "auth.globus.org"
                 }
             }
+
+        Each distinct token is revoked once, and empty tokens (such as a
+        missing refresh token) are skipped. Tokens are revoked concurrently if
+        ``max_workers`` is greater than one. Every token is attempted even if
+        some fail, after which a RevocationFailed exception is raised.
+
+        :raises fair_research_login.exc.RevocationFailed: If any tokens
+            could not be revoked
+        """
+        revocable = self.get_revocable(tokens)
+        results = self._map_concurrently(self._revoke_token,
+                                         revocable.values())
+        self._check_revoked(revocable, results)
+
+    @staticmethod
+    def _check_revoked(revocable, results):
+        """
+        Internal. Raise RevocationFailed with every error returned by
+        _revoke_token(), given results in the same order as ``revocable``.
         """
+        errors = {key: error for key, error in zip(revocable, results)
+                  if error is not None}
+        if errors:
+            raise RevocationFailed('Failed to revoke tokens: ', errors=errors)
+
+    def get_revocable(self, tokens):
+        """
+        Return unique, non-empty tokens from a token group, keyed by
+        (resource_server, token_type).
+        """
+        revocable, seen = {}, set()
         for rs, tok_set in tokens.items():
-            self.client.oauth2_revoke_token(tok_set.get('access_token'))
-            self.client.oauth2_revoke_token(tok_set.get('refresh_token'))
+            for token_type in ('access_token', 'refresh_token'):
+                token = tok_set.get(token_type)
+                if token and token not in seen:
+                    seen.add(token)
+                    revocable[(rs, token_type)] = token
+        return revocable
+
+    def _revoke_token(self, token):
+        """
+        Internal. Revoke a single token, returning any error raised by Globus
+        rather than raising it.
+        """
+        import globus_sdk
+        try:
+            with self._timer('revoke'):
+                self.client.oauth2_revoke_token(token)
+        except globus_sdk.GlobusError as ge:
+            log.debug('Failed to revoke token: {}'.format(ge))
+            self._increment('revoke_failures')
+            return ge
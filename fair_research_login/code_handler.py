@@ -15,6 +15,7 @@ class CodeHandler(object):
     The primary method to override is the ``get_code()`` method, used to
     complete the auth flow.
     """
+    # Shared by every code handler, client and thread in the process
     _browser_enabled = True
 
     def __init__(self, paste_url_in_browser_msg=None):
@@ -39,7 +40,9 @@ class CodeHandler(object):
     def set_browser_enabled(value):
         """
         Set whether login will automatically open the users browser to the
-        Globus Auth Link. GLOBAL SETTING, this will affect ALL Code Handlers.
+        Globus Auth Link. GLOBAL SETTING, this will affect ALL Code Handlers,
+        including those used by other clients and threads. It is also turned
+        off for the whole process if a user interrupts a login with ^C.
         """
         if value not in (True, False):
             raise ValueError('Value must be True or False')
@@ -69,3 +69,25 @@ class TokensExpired(LoadError):
             super(TokensExpired, self).__str__(),
             ', '.join(self.resource_servers)
         )
+
+
+class RevocationFailed(LoginException):
+    """
+    One or more tokens could not be revoked. ``errors`` maps
+    (resource_server, token_type) to the exception raised while revoking
+    that token.
+    """
+    def __init__(self, *args, **kwargs):
+        super(RevocationFailed, self).__init__(*args)
+        self.errors = kwargs.get('errors', {})
+
+    def __str__(self):
+        return '{} {}'.format(
+            super(RevocationFailed, self).__str__(),
+            ', '.join('{} ({})'.format(rs, tt) for rs, tt in self.errors)
+        )
+
+
+class BrokerError(LoginException):
+    """Tokens could not be read or written through a token broker."""
+    pass
@@ -0,0 +1,175 @@
+import logging
+import re
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+
+class Metrics(object):
+    """
+    Collects durations and counts for token operations, for use in
+    production dashboards. Pass an instance to NativeClient with the
+    ``metrics`` keyword. The client reports:
+
+    * ``storage_read``, ``storage_write``, ``storage_clear``: Timers for
+      calls to token storage
+    * ``token_validation``: Timer for validating loaded tokens
+    * ``cache_hits``, ``cache_misses``: Counters for the token cache
+    * ``load_tokens``: Timer for NativeClient.load_tokens(), including any
+      refreshes
+    * ``refresh``, ``refresh_failures``: Timer and counter for each
+      resource server refreshed, labeled by ``resource_server``
+    * ``revoke``, ``revoke_failures``: Timer and counter for each token
+      revoked
+    * ``code_handler_wait``: Timer for each code handler waiting on a user
+      during login(), labeled by ``handler``
+    * ``token_exchange``: Timer for exchanging an auth code for tokens
+
+    Totals are kept in memory and may be exported with
+    get_prometheus_text(). Listeners added with add_listener() are also
+    called with each measurement as it happens, such as a StatsdExporter.
+    A single Metrics object may be shared by any number of clients.
+
+    :param prefix: Prepended to each metric name on export
+    """
+
+    def __init__(self, prefix='fair_research_login'):
+        self.prefix = prefix
+        self.counters = {}
+        # (name, labels) -> (count, total seconds, max seconds)
+        self.timers = {}
+        self.listeners = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def add_listener(self, listener):
+        """
+        Call ``listener(kind, name, value, labels)`` for every measurement,
+        where ``kind`` is 'counter' or 'timer', and timer values are seconds.
+        """
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self.listeners.remove(listener)
+
+    def increment(self, name, value=1, **labels):
+        key = self.get_key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+        self.notify('counter', name, value, labels)
+
+    def observe(self, name, seconds, **labels):
+        key = self.get_key(name, labels)
+        with self._lock:
+            count, total, maximum = self.timers.get(key, (0, 0.0, 0.0))
+            self.timers[key] = (count + 1, total + seconds,
+                                max(maximum, seconds))
+        self.notify('timer', name, seconds, labels)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Time the context, including when it raises an exception."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def notify(self, kind, name, value, labels):
+        for listener in list(self.listeners):
+            try:
+                listener(kind, name, value, labels)
+            except Exception as e:
+                # Metrics must never break token operations
+                log.warning('Metrics listener {} failed: {}'
+                            ''.format(listener, e))
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.timers.clear()
+
+    def get_prometheus_text(self):
+        """
+        Return totals in the Prometheus text exposition format. Timers are
+        exported as summaries in seconds, with ``_count`` and ``_sum``.
+        """
+        with self._lock:
+            counters = sorted(self.counters.items())
+            timers = sorted(self.timers.items())
+        lines, typed = [], set()
+        for (name, labels), value in counters:
+            metric = '{}_{}_total'.format(self.prefix, name)
+            if metric not in typed:
+                typed.add(metric)
+                lines.append('# TYPE {} counter'.format(metric))
+            lines.append('{}{} {}'.format(metric, format_labels(labels),
+                                          value))
+        for (name, labels), (count, total, _) in timers:
+            metric = '{}_{}_seconds'.format(self.prefix, name)
+            if metric not in typed:
+                typed.add(metric)
+                lines.append('# TYPE {} summary'.format(metric))
+            label_text = format_labels(labels)
+            lines.append('{}_count{} {}'.format(metric, label_text, count))
+            lines.append('{}_sum{} {!r}'.format(metric, label_text, total))
+        return '\n'.join(lines) + '\n' if lines else ''
+
+
+def format_labels(labels):
+    """Format label pairs for the Prometheus text format."""
+    if not labels:
+        return ''
+    escaped = ('{}="{}"'.format(k, str(v).replace('\\', '\\\\')
+                                .replace('"', '\\"').replace('\n', '\\n'))
+               for k, v in labels)
+    return '{' + ','.join(escaped) + '}'
+
+
+class StatsdExporter(object):
+    """
+    A Metrics listener which sends each measurement to a statsd server over
+    UDP as it happens. Timers are sent in milliseconds. Label values are
+    appended to the metric name, so a refresh of ``auth.globus.org`` is sent
+    as ``fair_research_login.refresh.auth_globus_org``.
+
+    .. code-block:: python
+
+        metrics = Metrics()
+        metrics.add_listener(StatsdExporter('localhost', 8125))
+        cli = NativeClient(client_id='my_id', metrics=metrics)
+
+    :param host: The statsd host
+    :param port: The statsd port
+    :param prefix: Prepended to each metric name
+    """
+
+    def __init__(self, host='localhost', port=8125,
+                 prefix='fair_research_login'):
+        self.address = host, port
+        self.prefix = prefix
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    @staticmethod
+    def sanitize(value):
+        return re.sub(r'[^A-Za-z0-9_-]', '_', str(value))
+
+    def format(self, kind, name, value, labels):
+        parts = [self.prefix, name]
+        parts.extend(self.sanitize(v) for _, v in sorted(labels.items()))
+        if kind == 'timer':
+            return '{}:{:.3f}|ms'.format('.'.join(parts), value * 1000)
+        return '{}:{}|c'.format('.'.join(parts), value)
+
+    def __call__(self, kind, name, value, labels):
+        line = self.format(kind, name, value, labels)
+        self.socket.sendto(line.encode('utf-8'), self.address)
+
+    def close(self):
+        self.socket.close()
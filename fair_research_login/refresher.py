@@ -0,0 +1,103 @@
+import logging
+import threading
+import time
+
+from fair_research_login.exc import TokensExpired
+
+log = logging.getLogger(__name__)
+
+
+class TokenRefresher(threading.Thread):
+    """
+    A daemon thread which refreshes saved tokens shortly before they expire,
+    so long running services do not pay for a refresh while handling a
+    request. Typically started with ``NativeClient.start_refresher()``.
+
+    The refresher sleeps until the next refreshable token is within
+    ``margin`` seconds of expiring, refreshes every token which is due, and
+    saves them through the client's token storage. Tokens saved by other
+    means (such as a new login) are noticed within ``poll_interval``
+    seconds. Failed refreshes are retried after ``retry_interval`` seconds,
+    except for refresh tokens which Globus Auth rejected, which are skipped
+    until new tokens are saved for their resource server.
+
+    :param client: The NativeClient whose tokens will be refreshed
+    :param margin: Seconds before expiration a token will be refreshed
+    :param poll_interval: Maximum seconds to sleep before re-checking storage
+    :param retry_interval: Seconds to wait after a failed refresh
+    """
+
+    def __init__(self, client, margin=300, poll_interval=300,
+                 retry_interval=60):
+        super(TokenRefresher, self).__init__(name='TokenRefresher',
+                                             daemon=True)
+        self.client = client
+        self.margin = margin
+        self.poll_interval = poll_interval
+        self.retry_interval = retry_interval
+        self._stopped = threading.Event()
+        # resource_server -> refresh token which was rejected
+        self._rejected = {}
+
+    def run(self):
+        delay = 0
+        while not self._stopped.wait(delay):
+            try:
+                delay = self.refresh_due()
+            except Exception as e:
+                log.warning('Background token refresh failed, retrying in '
+                            '{}s: {}'.format(self.retry_interval, e))
+                delay = self.retry_interval
+
+    def stop(self, timeout=None):
+        """Stop the refresher and wait for it to finish."""
+        self._stopped.set()
+        if self.is_alive():
+            self.join(timeout)
+
+    def get_due(self, tokens, now=None):
+        """
+        Return refreshable tokens which expire within ``margin`` seconds of
+        ``now``.
+        """
+        now = now or time.time()
+        return {rs: ts for rs, ts in self.get_refreshable(tokens).items()
+                if ts['expires_at_seconds'] - self.margin <= now}
+
+    def get_delay(self, tokens, now=None):
+        """Seconds until the next refreshable token is due for a refresh."""
+        now = now or time.time()
+        due_times = [ts['expires_at_seconds'] - self.margin - now
+                     for ts in self.get_refreshable(tokens).values()]
+        return max(0, min(due_times + [self.poll_interval]))
+
+    def get_refreshable(self, tokens):
+        """Refreshable tokens, leaving out rejected refresh tokens."""
+        refreshable = self.client.get_refreshable(tokens)
+        return {rs: ts for rs, ts in refreshable.items()
+                if self._rejected.get(rs) != ts['refresh_token']}
+
+    def refresh_due(self):
+        """
+        Refresh tokens which are due, and return the number of seconds until
+        this should be called again.
+        """
+        tokens = self.client._load_token_groups()
+        due = self.get_due(tokens)
+        if due:
+            log.debug('Refreshing tokens for {}'.format(', '.join(due)))
+            try:
+                tokens.update(self.client._refresh_expired(
+                    due, margin=self.margin))
+            except TokensExpired as te:
+                log.warning('Refresh tokens for {} were rejected, and will '
+                            'not be retried until new tokens are saved'
+                            ''.format(', '.join(te.resource_servers)))
+                for rs in te.resource_servers:
+                    self._rejected[rs] = due[rs]['refresh_token']
+                # Tokens for other resource servers may have been saved
+                tokens = self.client._load_token_groups()
+            if self.get_due(tokens):
+                # Don't spin if new tokens still expire within the margin
+                return self.retry_interval
+        return self.get_delay(tokens)
@@ -2,18 +2,33 @@ from fair_research_login.token_storage.json_token_storage import (
     JSONTokenStorage
 )
 from fair_research_login.token_storage.configparser_token_storage import (
-    ConfigParserTokenStorage, MultiClientTokenStorage
+    ConfigParserTokenStorage, MultiClientTokenStorage, CompactionResult
+)
+from fair_research_login.token_storage.sqlite_token_storage import (
+    SQLiteTokenStorage, MultiClientSQLiteTokenStorage
+)
+from fair_research_login.token_storage.binary_token_storage import (
+    BinaryTokenStorage, MultiClientBinaryTokenStorage
+)
+from fair_research_login.token_storage.token_cache import TokenCache
+from fair_research_login.token_storage.write_behind import (
+    WriteBehindTokenStorage
 )
 from fair_research_login.token_storage.storage_tools import (
     flat_pack, flat_unpack, check_expired, check_scopes, get_scopes,
-    is_expired, verify_token_group, TOKEN_GROUP_KEYS, REQUIRED_TOKEN_KEYS
+    get_scope_index, is_expired, verify_token_group, TokenGroup,
+    compact_flat_tokens, is_token_key, TOKEN_GROUP_KEYS, REQUIRED_TOKEN_KEYS
 )
 
 __all__ = [
     'JSONTokenStorage', 'ConfigParserTokenStorage',
-    'MultiClientTokenStorage',
+    'MultiClientTokenStorage', 'SQLiteTokenStorage',
+    'MultiClientSQLiteTokenStorage', 'BinaryTokenStorage',
+    'MultiClientBinaryTokenStorage', 'WriteBehindTokenStorage', 'TokenCache',
+    'CompactionResult',
 
     'flat_pack', 'flat_unpack', 'check_expired', 'check_scopes', 'get_scopes',
-    'is_expired', 'verify_token_group', 'TOKEN_GROUP_KEYS',
-    'REQUIRED_TOKEN_KEYS',
+    'get_scope_index', 'is_expired', 'verify_token_group', 'TokenGroup',
+    'compact_flat_tokens', 'is_token_key',
+    'TOKEN_GROUP_KEYS', 'REQUIRED_TOKEN_KEYS',
 ]
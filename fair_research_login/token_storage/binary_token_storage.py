@@ -0,0 +1,215 @@
+import mmap
+import os
+import stat
+import struct
+import threading
+
+from fair_research_login.token_storage.locking import file_lock, atomic_write
+
+
+class BinaryTokenStorage(object):
+    """
+    Stores tokens in a compact binary file using only the Python standard
+    library, for hosts which keep very many token groups in one place.
+    Reads memory map the file and use a sorted index of sections and
+    resource servers, so looking up a section only decodes its own token
+    groups, no matter how many others are in the file.
+
+    The file starts with a header, followed by a fixed size index entry for
+    each token group, the section and resource server keys, and then the
+    token group records. Writes hold an exclusive lock and replace the file
+    atomically, copying records for other sections without decoding them.
+    Readers never see a partially written file and do not need a lock.
+    """
+    DEFAULT_FILENAME = os.path.expanduser('~/.globus-native-apps.tokens')
+    DEFAULT_PERMISSION = stat.S_IRUSR | stat.S_IWUSR
+    DEFAULT_SECTION = 'tokens'
+    MAGIC = b'FRLT'
+    VERSION = 1
+    # magic, version, number of index entries
+    HEADER = struct.Struct('<4sHI')
+    # key offset, key length, record offset, record length
+    ENTRY = struct.Struct('<QHQI')
+    EXPIRES = struct.Struct('<q')
+    LENGTH = struct.Struct('<i')
+    # Written in this order after expires_at_seconds. None is stored with a
+    # length of -1.
+    STRING_FIELDS = ('resource_server', 'access_token', 'refresh_token',
+                     'scope', 'token_type')
+    SEPARATOR = b'\0'
+
+    def __init__(self, filename=None, section=None, permission=None):
+        self.section = section or self.DEFAULT_SECTION
+        self.filename = filename or self.DEFAULT_FILENAME
+        self.permission = permission or self.DEFAULT_PERMISSION
+        self._mapped = None
+        self._map_lock = threading.Lock()
+
+    @classmethod
+    def encode_record(cls, token_group):
+        parts = [cls.EXPIRES.pack(int(token_group['expires_at_seconds']))]
+        for field in cls.STRING_FIELDS:
+            value = token_group.get(field)
+            if value is None:
+                parts.append(cls.LENGTH.pack(-1))
+            else:
+                value = value.encode('utf-8')
+                parts.append(cls.LENGTH.pack(len(value)))
+                parts.append(value)
+        return b''.join(parts)
+
+    @classmethod
+    def decode_record(cls, data, offset=0):
+        token_group = {
+            'expires_at_seconds': cls.EXPIRES.unpack_from(data, offset)[0]
+        }
+        offset += cls.EXPIRES.size
+        for field in cls.STRING_FIELDS:
+            length = cls.LENGTH.unpack_from(data, offset)[0]
+            offset += cls.LENGTH.size
+            if length < 0:
+                token_group[field] = None
+            else:
+                token_group[field] = bytes(
+                    data[offset:offset + length]).decode('utf-8')
+                offset += length
+        return token_group
+
+    @classmethod
+    def get_key(cls, section, resource_server=''):
+        return (section.encode('utf-8') + cls.SEPARATOR +
+                resource_server.encode('utf-8'))
+
+    def get_mapped(self):
+        """
+        Return (stamp, mmap, entry count) for the current file, reusing the
+        existing map until the file is replaced. Returns None if there is no
+        token file.
+        """
+        try:
+            st = os.stat(self.filename)
+        except OSError:
+            return None
+        stamp = st.st_mtime_ns, st.st_size, st.st_ino
+        with self._map_lock:
+            if self._mapped is not None and self._mapped[0] == stamp:
+                return self._mapped
+            if not st.st_size:
+                return None
+            with open(self.filename, 'rb') as fh:
+                data = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, count = self.HEADER.unpack_from(data)
+            if magic != self.MAGIC or version != self.VERSION:
+                data.close()
+                raise ValueError('{} is not a version {} token file'
+                                 ''.format(self.filename, self.VERSION))
+            # An old map is left for the garbage collector to close, since
+            # other threads may still be reading from it.
+            self._mapped = stamp, data, count
+            return self._mapped
+
+    def _get_entry(self, data, num):
+        return self.ENTRY.unpack_from(
+            data, self.HEADER.size + num * self.ENTRY.size)
+
+    def _get_entry_key(self, data, num):
+        key_offset, key_length, _, _ = self._get_entry(data, num)
+        return data[key_offset:key_offset + key_length]
+
+    def iter_section(self, mapped, section):
+        """Yield (key, record offset, record length) in ``section``."""
+        _, data, count = mapped
+        prefix = self.get_key(section)
+        # Binary search the sorted index for the first key in the section
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._get_entry_key(data, mid) < prefix:
+                lo = mid + 1
+            else:
+                hi = mid
+        for num in range(lo, count):
+            key_offset, key_length, rec_offset, rec_length = \
+                self._get_entry(data, num)
+            key = data[key_offset:key_offset + key_length]
+            if not key.startswith(prefix):
+                break
+            yield key, rec_offset, rec_length
+
+    def read_records(self):
+        """Return a dict of every raw record in the file, keyed by key."""
+        mapped = self.get_mapped()
+        if mapped is None:
+            return {}
+        _, data, count = mapped
+        records = {}
+        for num in range(count):
+            key_offset, key_length, rec_offset, rec_length = \
+                self._get_entry(data, num)
+            records[data[key_offset:key_offset + key_length]] = \
+                data[rec_offset:rec_offset + rec_length]
+        return records
+
+    def write_records(self, records):
+        """Write a new file from a dict of raw records keyed by key."""
+        keys = sorted(records)
+        key_start = self.HEADER.size + len(keys) * self.ENTRY.size
+        rec_start = key_start + sum(len(k) for k in keys)
+        entries, key_offset, rec_offset = [], key_start, rec_start
+        for key in keys:
+            entries.append(self.ENTRY.pack(key_offset, len(key), rec_offset,
+                                           len(records[key])))
+            key_offset += len(key)
+            rec_offset += len(records[key])
+        with atomic_write(self.filename, self.permission, mode='wb') as fh:
+            fh.write(self.HEADER.pack(self.MAGIC, self.VERSION, len(keys)))
+            fh.write(b''.join(entries))
+            fh.write(b''.join(keys))
+            fh.write(b''.join(records[key] for key in keys))
+
+    def _save(self, tokens, replace_section):
+        with file_lock(self.filename):
+            records = self.read_records()
+            if replace_section:
+                prefix = self.get_key(self.section)
+                records = {k: v for k, v in records.items()
+                           if not k.startswith(prefix)}
+            for rs, token_group in tokens.items():
+                records[self.get_key(self.section, rs)] = \
+                    self.encode_record(token_group)
+            self.write_records(records)
+
+    def write_tokens(self, tokens):
+        """Replace all tokens in this section with ``tokens``."""
+        self._save(tokens, replace_section=True)
+
+    def update_tokens(self, tokens):
+        """
+        Merge ``tokens`` into this section. Tokens for other resource servers
+        are left untouched.
+        """
+        self._save(tokens, replace_section=False)
+
+    def read_tokens(self):
+        mapped = self.get_mapped()
+        if mapped is None:
+            return {}
+        data = mapped[1]
+        tokens = {}
+        for _, rec_offset, _ in self.iter_section(mapped, self.section):
+            token_group = self.decode_record(data, rec_offset)
+            tokens[token_group['resource_server']] = token_group
+        return tokens
+
+    def clear_tokens(self):
+        self._save({}, replace_section=True)
+
+
+class MultiClientBinaryTokenStorage(BinaryTokenStorage):
+    """
+    An extension on BinaryTokenStorage which stores tokens separately for
+    each client_id used for the app, like MultiClientTokenStorage.
+    """
+
+    def set_client_id(self, client_id):
+        self.section = client_id
@@ -0,0 +1,296 @@
+import io
+import locale
+import os
+import re
+import threading
+from configparser import ConfigParser, Error as ConfigError
+
+from fair_research_login.token_storage.locking import atomic_write
+
+# Config files are read and written with the same default encoding
+# ConfigParser.read() and open() use.
+ENCODING = locale.getpreferredencoding(False)
+# Lines which start at the first column with '[' may be section headers.
+# Indented lines are values continued from the line above.
+HEADER_LINES = re.compile(r'^\[.*$', re.MULTILINE)
+BYTES_HEADER_LINES = re.compile(rb'^\[.*$', re.MULTILINE)
+
+_index_cache = {}
+_index_lock = threading.Lock()
+
+
+def get_stamp(filename):
+    """Return a value which changes when ``filename`` changes, or None."""
+    try:
+        st = os.stat(filename)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+
+def build_index(data):
+    """
+    Return a dict mapping section names to (start, end) offsets in ``data``,
+    the contents of a config file. Offsets are in bytes if ``data`` is bytes,
+    otherwise characters. The span for each section starts at its header and
+    ends at the next header. Returns None if a section appears more than
+    once, which ConfigParser rejects.
+    """
+    is_bytes = isinstance(data, bytes)
+    index, name = {}, None
+    for match in (BYTES_HEADER_LINES if is_bytes else
+                  HEADER_LINES).finditer(data):
+        line = match.group().strip()
+        header = ConfigParser.SECTCRE.match(
+            line.decode(ENCODING) if is_bytes else line)
+        if header is None:
+            continue
+        if name is not None:
+            index[name] = (index[name][0], match.start())
+        name = header.group('header')
+        if name in index:
+            return None
+        index[name] = (match.start(), None)
+    if name is not None:
+        index[name] = (index[name][0], len(data))
+    return index
+
+
+def read_index(filename):
+    """
+    Return the section index and stamp for ``filename``, using the cached
+    index if the file has not changed since it was built.
+    """
+    key, stamp = os.path.abspath(filename), get_stamp(filename)
+    if stamp is None:
+        return {}, None
+    with _index_lock:
+        cached = _index_cache.get(key)
+    if cached is not None and cached[0] == stamp:
+        return cached[1], stamp
+    with open(filename, 'rb') as fh:
+        index = build_index(fh.read())
+    with _index_lock:
+        _index_cache[key] = (stamp, index)
+    return index, stamp
+
+
+def forget_index(filename):
+    with _index_lock:
+        _index_cache.pop(os.path.abspath(filename), None)
+
+
+def read_chunks(filename, index, sections):
+    """Read the raw text for each section in ``sections`` found in index."""
+    spans = sorted(index[s] for s in sections if s in index)
+    chunks = []
+    with open(filename, 'rb') as fh:
+        for start, end in spans:
+            fh.seek(start)
+            chunks.append(fh.read(end - start).decode(ENCODING))
+    return chunks
+
+
+def parse_section(chunks, section):
+    config = ConfigParser()
+    config.read_string('\n'.join(chunks))
+    if not config.has_section(section):
+        return None
+    return dict(config.items(section))
+
+
+def parse_own_options(chunk, section):
+    """
+    Return the options set in ``section`` itself, parsed from ``chunk``,
+    its text alone. Values are raw, as ConfigParser writes them, and
+    options from DEFAULT are left out, so they can be formatted back into
+    the file unchanged.
+    """
+    config = ConfigParser(interpolation=None)
+    config.read_string(chunk)
+    if not config.has_section(section):
+        return None
+    return dict(config.items(section))
+
+
+def parse_sections(chunks, sections):
+    """Like parse_section(), returning a dict of options for each section."""
+    config = ConfigParser()
+    config.read_string('\n'.join(chunks))
+    return {section: dict(config.items(section)) for section in sections
+            if config.has_section(section)}
+
+
+def read_section(filename, section, retry=True):
+    """
+    Return the options in ``section`` of config file ``filename`` as a
+    dict, parsing only that section (and DEFAULT, which supplies values to
+    all sections). Returns an empty dict if the file or section does not
+    exist.
+
+    Section offsets are cached until the file changes, so for large files
+    shared by many clients each read only seeks to and parses one section.
+    """
+    index, _ = read_index(filename)
+    if index is None:
+        config = ConfigParser()
+        # Raises the same error ConfigParser would for a malformed file
+        config.read(filename)
+        return {}
+    if section not in index:
+        return {}
+    sections = [section, ConfigParser().default_section]
+    try:
+        options = parse_section(read_chunks(filename, index, sections),
+                                section)
+    except ConfigError:
+        if not retry:
+            raise
+        options = None
+    if options is None and retry:
+        # The file changed after it was indexed, retry with a fresh index
+        forget_index(filename)
+        return read_section(filename, section, retry=False)
+    return options or {}
+
+
+def read_sections(filename, sections, retry=True):
+    """
+    Like read_section(), but returns a dict of options for each section in
+    ``sections``, reading and parsing them all at once. Sections which do
+    not exist are left out.
+    """
+    index, _ = read_index(filename)
+    if index is None:
+        config = ConfigParser()
+        config.read(filename)
+        return {}
+    found = [section for section in sections if section in index]
+    if not found:
+        return {}
+    chunks = read_chunks(filename, index,
+                         found + [ConfigParser().default_section])
+    try:
+        options = parse_sections(chunks, found)
+    except ConfigError:
+        if not retry:
+            raise
+        options = {}
+    if len(options) != len(found) and retry:
+        forget_index(filename)
+        return read_sections(filename, sections, retry=False)
+    return options
+
+
+def format_section(section, options, newline='\n'):
+    """
+    Return config text for a single section, as ConfigParser writes it, with
+    lines ending in ``newline``.
+    """
+    config = ConfigParser()
+    config.add_section(section)
+    for name, value in options.items():
+        config.set(section, name, value)
+    buf = io.StringIO()
+    config.write(buf)
+    return buf.getvalue().replace('\n', newline)
+
+
+def read_config(filename):
+    """
+    Return the text of a config file and the line ending it uses. Newlines
+    are not translated, so text written back is byte-for-byte the same.
+    """
+    with open(filename, newline='') as fh:
+        data = fh.read()
+    return data, '\r\n' if '\r\n' in data else '\n'
+
+
+def update_section(filename, section, options, permission, atomic=False):
+    """
+    Merge ``options`` into ``section`` of config file ``filename``. Only
+    that section is parsed and re-formatted, every other section is copied
+    as-is. The section is added to the end of the file if it does not exist.
+    """
+    update_sections(filename, {section: options}, permission, atomic=atomic)
+
+
+def update_sections(filename, updates, permission, atomic=False):
+    """
+    Like update_section(), but merges options into many sections with one
+    read and one write of the file. ``updates`` maps section names to the
+    options to merge into them.
+    """
+    data, newline = '', '\n'
+    if os.path.exists(filename):
+        data, newline = read_config(filename)
+    index = build_index(data)
+    if index is None:
+        # Raises the same error ConfigParser would for duplicate sections
+        ConfigParser().read_string(data, source=filename)
+    parts, last = [], 0
+    for section, span in sorted(index.items(), key=lambda i: i[1]):
+        if section not in updates:
+            continue
+        current = parse_own_options(data[slice(*span)], section) or {}
+        current.update(updates[section])
+        parts.extend([data[last:span[0]],
+                      format_section(section, current, newline)])
+        last = span[1]
+    parts.append(data[last:])
+    new_sections = [format_section(section, options, newline)
+                    for section, options in updates.items()
+                    if section not in index]
+    if new_sections and data and not data.endswith('\n'):
+        parts.append(newline)
+    write_config(filename, ''.join(parts + new_sections), permission,
+                 atomic=atomic)
+
+
+def rewrite_sections(filename, rewrite, permission, atomic=False):
+    """
+    Pass the options of each section in config file ``filename`` to
+    ``rewrite(section, options)``, which returns the options to keep, or
+    None to remove the section. Options are raw and do not include DEFAULT,
+    see parse_own_options(). Sections which are not changed are copied
+    as-is, and DEFAULT is left alone. Returns the number of bytes removed
+    from the file.
+    """
+    if not os.path.exists(filename):
+        return 0
+    data, newline = read_config(filename)
+    index = build_index(data)
+    if index is None:
+        ConfigParser().read_string(data, source=filename)
+    parts, last = [], 0
+    for section, (start, end) in sorted(index.items(), key=lambda i: i[1]):
+        # Keep anything before the first section, such as comments
+        parts.append(data[last:start])
+        last = end
+        chunk = data[start:end]
+        if section == ConfigParser().default_section:
+            parts.append(chunk)
+            continue
+        options = parse_own_options(chunk, section)
+        new_options = rewrite(section, options)
+        if new_options is None:
+            continue
+        parts.append(chunk if new_options == options else
+                     format_section(section, new_options, newline))
+    parts.append(data[last:])
+    new_data = ''.join(parts)
+    if new_data != data:
+        write_config(filename, new_data, permission, atomic=atomic)
+    return len(data.encode(ENCODING)) - len(new_data.encode(ENCODING))
+
+
+def write_config(filename, data, permission, atomic=False):
+    """Write the text of a config file, and drop its cached index."""
+    if atomic:
+        with atomic_write(filename, permission, newline='') as fh:
+            fh.write(data)
+    else:
+        with open(filename, 'w', newline='') as fh:
+            fh.write(data)
+        os.chmod(filename, permission)
+    forget_index(filename)
@@ -1,26 +1,66 @@
 import os
 import stat
+import time
+from collections import namedtuple
 from configparser import ConfigParser
+from contextlib import nullcontext
 
 from fair_research_login.token_storage.storage_tools import (
-    flat_pack, flat_unpack
+    flat_pack, flat_unpack, compact_flat_tokens, is_token_key,
+    verify_token_group, TokenGroup
 )
+from fair_research_login.token_storage.locking import file_lock, atomic_write
+from fair_research_login.token_storage.config_sections import (
+    read_section, read_sections, update_section, update_sections,
+    rewrite_sections, forget_index
+)
+
+CompactionResult = namedtuple('CompactionResult', [
+    'bytes_reclaimed', 'sections_removed', 'groups_removed', 'keys_removed'
+])
 
 
 class ConfigParserTokenStorage(object):
     """
     Basic ConfigParser object which allows for storage without any external
     Python dependencies.
+
+    If ``atomic`` is True, reads hold a shared lock and writes hold an
+    exclusive lock on the config file, and new configs are written to a
+    temporary file which then replaces the old one. This prevents many
+    processes saving tokens at once from overwriting each other's changes,
+    or reading a config while it is only partially written.
+
+    Only this storage's section is parsed when reading tokens, and only it
+    is re-written when writing them. Section offsets in the file are cached
+    until it changes, so files shared by many clients stay fast to use.
+
+    Tokens which can no longer be used are removed by compact(). If
+    ``auto_compact`` is True, writes also compact the file if it has not been
+    compacted for ``COMPACT_INTERVAL`` seconds, tracked by the modification
+    time of a ``.compacted`` file next to it. ``max_age`` is passed to
+    compact().
     """
     DEFAULT_FILENAME = os.path.expanduser('~/.globus-native-apps.cfg')
     DEFAULT_PERMISSION = stat.S_IRUSR | stat.S_IWUSR
     CONFIG_TOKEN_GROUPS = 'token_groups'
     CFG_SECTION = 'tokens'
+    COMPACT_INTERVAL = 24 * 60 * 60
+    MAX_AGE = None
 
-    def __init__(self, filename=None, section=None, permission=None):
+    def __init__(self, filename=None, section=None, permission=None,
+                 atomic=False, auto_compact=False, max_age=None):
         self.section = section or self.CFG_SECTION
         self.filename = filename or self.DEFAULT_FILENAME
         self.permission = permission or self.DEFAULT_PERMISSION
+        self.atomic = atomic
+        self.auto_compact = auto_compact
+        self.max_age = self.MAX_AGE if max_age is None else max_age
+
+    def lock(self, shared=False):
+        if self.atomic:
+            return file_lock(self.filename, shared=shared)
+        return nullcontext()
 
     def load(self):
         config = ConfigParser()
@@ -30,31 +70,138 @@ class ConfigParserTokenStorage(object):
         return config
 
     def save(self, config):
+        if self.atomic:
+            with atomic_write(self.filename, self.permission) as configfile:
+                config.write(configfile)
+            return
         with open(self.filename, 'w') as configfile:
             config.write(configfile)
         os.chmod(self.filename, self.DEFAULT_PERMISSION)
 
     def write_tokens(self, tokens):
-        config = self.load()
-        for name, value in flat_pack(tokens).items():
-            config.set(self.section, name, value)
-        self.save(config)
+        with self.lock():
+            update_section(self.filename, self.section, flat_pack(tokens),
+                           self.permission, atomic=self.atomic)
+            if self.auto_compact and self.compaction_due():
+                self._compact(self.max_age)
+
+    def update_tokens(self, tokens):
+        """
+        Merge tokens into this section with one read and one write of the
+        config file. Tokens for other resource servers are left untouched.
+        """
+        # Setting options never removes existing ones, so writing tokens
+        # already merges them into the section.
+        self.write_tokens(tokens)
 
     def read_tokens(self):
-        return flat_unpack(dict(self.load().items(self.section)))
+        with self.lock(shared=True):
+            options = read_section(self.filename, self.section)
+        return flat_unpack(options)
 
     def clear_tokens(self):
-        config = self.load()
-        config.remove_section(self.section)
-        config.add_section(self.section)
-        self.save(config)
+        with self.lock():
+            config = self.load()
+            config.remove_section(self.section)
+            config.add_section(self.section)
+            self.save(config)
+        forget_index(self.filename)
+
+    def compaction_filename(self):
+        return '{}.compacted'.format(self.filename)
+
+    def compaction_due(self):
+        try:
+            compacted = os.path.getmtime(self.compaction_filename())
+        except OSError:
+            return True
+        return compacted + self.COMPACT_INTERVAL < time.time()
+
+    def is_compactable(self, section, options):
+        """Returns True if compact() may remove tokens in ``section``."""
+        return section == self.section
+
+    def compact(self, max_age=None):
+        """
+        Remove tokens which can no longer be used, and return a
+        CompactionResult with the number of bytes reclaimed and what was
+        removed. Removes token groups which have expired and cannot be
+        refreshed, keys which do not belong to a valid token group, and
+        sections left with no tokens. If ``max_age`` is set (Defaults to the
+        storage's ``max_age``), tokens which have not been saved or
+        refreshed for ``max_age`` seconds are also removed.
+        """
+        with self.lock():
+            return self._compact(self.max_age if max_age is None else max_age)
+
+    def _compact(self, max_age):
+        counts = dict(sections_removed=0, groups_removed=0, keys_removed=0)
+
+        def rewrite(section, options):
+            if not self.is_compactable(section, options):
+                return options
+            live, groups, keys = compact_flat_tokens(options, max_age=max_age)
+            counts['groups_removed'] += groups
+            counts['keys_removed'] += keys
+            if live:
+                return live
+            counts['sections_removed'] += 1
+            return None
+
+        reclaimed = rewrite_sections(self.filename, rewrite, self.permission,
+                                     atomic=self.atomic)
+        with open(self.compaction_filename(), 'a'):
+            os.utime(self.compaction_filename())
+        return CompactionResult(reclaimed, **counts)
 
 
 class MultiClientTokenStorage(ConfigParserTokenStorage):
     """
     An extension on ConfigParserTokenStorage which allows for saving tokens
     in separate sections based on the passed in client_id used for the app.
+
+    compact() removes dead tokens from every client's section, and sections
+    for clients whose tokens have not been saved or refreshed for
+    ``MAX_AGE`` seconds (90 days) unless another ``max_age`` is given.
+
+    Apps managing many client ids can load or save tokens for all of them
+    at once with read_tokens_by_client() and write_tokens_by_client().
     """
+    MAX_AGE = 90 * 24 * 60 * 60
 
     def set_client_id(self, client_id):
         self.section = client_id
+
+    def read_tokens_by_client(self, client_ids):
+        """
+        Return validated TokenGroups for each client in ``client_ids``,
+        keyed by client_id and then by resource server, reading the file
+        once. Clients without saved tokens map to an empty dict. Tokens are
+        not checked for expiration.
+        """
+        with self.lock(shared=True):
+            sections = read_sections(self.filename, client_ids)
+        return {client_id: {
+            rs: TokenGroup.from_dict(ts)
+            for rs, ts in flat_unpack(sections.get(client_id, {})).items()
+        } for client_id in client_ids}
+
+    def write_tokens_by_client(self, tokens_by_client):
+        """
+        Merge tokens for many clients into their sections with one write of
+        the file. ``tokens_by_client`` maps each client_id to a dict of
+        token groups keyed by resource server, which are validated before
+        anything is written.
+        """
+        updates = {client_id: flat_pack({rs: verify_token_group(ts)
+                                         for rs, ts in tokens.items()})
+                   for client_id, tokens in tokens_by_client.items()}
+        with self.lock():
+            update_sections(self.filename, updates, self.permission,
+                            atomic=self.atomic)
+            if self.auto_compact and self.compaction_due():
+                self._compact(self.max_age)
+
+    def is_compactable(self, section, options):
+        # Sections belong to other clients, but may hold other settings
+        return not options or any(is_token_key(key) for key in options)
@@ -1,28 +1,64 @@
 import json
 import os
 import stat
+from contextlib import nullcontext
+
+from fair_research_login.token_storage.locking import file_lock, atomic_write
 
 
 class JSONTokenStorage(object):
     """
     Stores tokens in json format on disk in the local directory by default.
+
+    If ``atomic`` is True, reads hold a shared lock and writes hold an
+    exclusive lock on the file, and tokens are written to a temporary file
+    which then replaces the old one.
     """
 
-    def __init__(self, filename=None, permission=None):
+    def __init__(self, filename=None, permission=None, atomic=False):
         self.filename = filename or 'mytokens.json'
         self.permission = permission or stat.S_IRUSR | stat.S_IWUSR
+        self.atomic = atomic
+
+    def lock(self, shared=False):
+        if self.atomic:
+            return file_lock(self.filename, shared=shared)
+        return nullcontext()
 
     def write_tokens(self, tokens):
+        with self.lock():
+            self._write(tokens)
+
+    def update_tokens(self, tokens):
+        """
+        Merge tokens into the saved tokens with one read and one write.
+        Tokens for other resource servers are left untouched.
+        """
+        with self.lock():
+            saved = self._read() or {}
+            saved.update(tokens)
+            self._write(saved)
+
+    def read_tokens(self):
+        with self.lock(shared=True):
+            return self._read()
+
+    def clear_tokens(self):
+        with self.lock():
+            os.remove(self.filename)
+
+    def _write(self, tokens):
+        if self.atomic:
+            with atomic_write(self.filename, self.permission) as fh:
+                json.dump(tokens, fh, indent=2)
+            return
         with open(self.filename, 'w+') as fh:
             json.dump(tokens, fh, indent=2)
 
-    def read_tokens(self):
+    def _read(self):
         if not os.path.exists(self.filename):
             return None
         with open(self.filename) as fh:
             content = fh.read()
             if content:
                 return json.loads(content)
-
-    def clear_tokens(self):
-        os.remove(self.filename)
@@ -0,0 +1,125 @@
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    # Advisory locks are not available on Windows. Writes are still atomic.
+    fcntl = None
+
+
+def lock_filename(filename):
+    return '{}.lock'.format(filename)
+
+
+@contextmanager
+def file_lock(filename, shared=False):
+    """
+    Hold an advisory fcntl lock for ``filename`` for the duration of the
+    context. Shared locks may be held by many readers at once, exclusive
+    locks by a single writer. The lock is taken on a separate ``.lock`` file,
+    since atomic_write() replaces ``filename`` and a lock on the old file
+    would not be seen by processes which open the new one.
+    """
+    if fcntl is None:
+        yield
+        return
+    fd = os.open(lock_filename(filename), os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        yield
+    finally:
+        # Closing the file releases the lock
+        os.close(fd)
+
+
+class ReadWriteLock(object):
+    """
+    A lock between threads in one process, which may be held by many readers
+    at once or by a single writer. Waiting writers are given priority over
+    new readers. Both are re-entrant: a thread already holding the read lock
+    may take it again while a writer waits, and the thread holding the write
+    lock may also take the read lock, so writers may read current values
+    before replacing them. A reader may not take the write lock.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        # thread ident -> number of times the read lock is held
+        self._readers = {}
+        self._writer = None
+        self._writer_depth = 0
+        self._waiting_writers = 0
+
+    @contextmanager
+    def shared(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                counted = False
+            else:
+                if me not in self._readers:
+                    while self._writer is not None or self._waiting_writers:
+                        self._cond.wait()
+                self._readers[me] = self._readers.get(me, 0) + 1
+                counted = True
+        try:
+            yield
+        finally:
+            if counted:
+                with self._cond:
+                    self._readers[me] -= 1
+                    if not self._readers[me]:
+                        del self._readers[me]
+                        if not self._readers:
+                            self._cond.notify_all()
+
+    @contextmanager
+    def exclusive(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer != me:
+                self._waiting_writers += 1
+                try:
+                    while self._writer is not None or self._readers:
+                        self._cond.wait()
+                finally:
+                    self._waiting_writers -= 1
+                self._writer = me
+            self._writer_depth += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer_depth -= 1
+                if not self._writer_depth:
+                    self._writer = None
+                    self._cond.notify_all()
+
+
+@contextmanager
+def atomic_write(filename, permission, mode='w', newline=None):
+    """
+    Yield a file handle to a temporary file next to ``filename``, which
+    replaces ``filename`` once the context exits without error. Readers see
+    either the old file or the new one, never a partially written file.
+    ``newline`` is passed to open() for text modes.
+    """
+    dirname, basename = os.path.split(os.path.abspath(filename))
+    fd, tmp_filename = tempfile.mkstemp(dir=dirname, suffix='.tmp',
+                                        prefix='.{}.'.format(basename))
+    try:
+        with os.fdopen(fd, mode, newline=newline) as fh:
+            yield fh
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.chmod(tmp_filename, permission)
+        os.replace(tmp_filename, filename)
+    except BaseException:
+        try:
+            os.remove(tmp_filename)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,121 @@
+import os
+import stat
+import sqlite3
+import threading
+
+
+class SQLiteTokenStorage(object):
+    """
+    Stores tokens in a SQLite database using only the Python standard
+    library. Each token group is kept in its own row, keyed by section and
+    resource server, so saving tokens for one resource server does not
+    rewrite any others. The database uses write-ahead logging, allowing
+    readers in other processes to continue while tokens are written.
+    """
+    DEFAULT_FILENAME = os.path.expanduser('~/.globus-native-apps.db')
+    DEFAULT_PERMISSION = stat.S_IRUSR | stat.S_IWUSR
+    DEFAULT_SECTION = 'tokens'
+    TIMEOUT = 30
+    TOKEN_COLUMNS = ('resource_server', 'access_token', 'refresh_token',
+                     'expires_at_seconds', 'scope', 'token_type')
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS tokens (
+            section TEXT NOT NULL,
+            resource_server TEXT NOT NULL,
+            access_token TEXT NOT NULL,
+            refresh_token TEXT,
+            expires_at_seconds INTEGER NOT NULL,
+            scope TEXT NOT NULL,
+            token_type TEXT,
+            PRIMARY KEY (section, resource_server)
+        )
+    """
+
+    def __init__(self, filename=None, section=None, permission=None):
+        self.section = section or self.DEFAULT_SECTION
+        self.filename = filename or self.DEFAULT_FILENAME
+        self.permission = permission or self.DEFAULT_PERMISSION
+        self._local = threading.local()
+
+    def connect(self):
+        """
+        Return a connection to the database. sqlite3 connections cannot be
+        shared between threads or forked processes, so one is kept for
+        each thread and reopened after a fork.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        # Create the file first, so it (and the -wal and -shm files SQLite
+        # creates alongside it) are not readable by other users.
+        os.close(os.open(self.filename, os.O_CREAT | os.O_RDWR,
+                         self.permission))
+        conn = sqlite3.connect(self.filename, timeout=self.TIMEOUT)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(self.SCHEMA)
+        self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _get_rows(self, tokens):
+        return [(self.section,) + tuple(ts.get(col) for col in
+                                        self.TOKEN_COLUMNS)
+                for ts in tokens.values()]
+
+    def write_tokens(self, tokens):
+        """Replace all tokens in this section with ``tokens``."""
+        with self.connect() as conn:
+            conn.execute('DELETE FROM tokens WHERE section = ?',
+                         (self.section,))
+            self._insert(conn, tokens)
+
+    def update_tokens(self, tokens):
+        """
+        Insert or replace the rows for each resource server in ``tokens``.
+        Rows for other resource servers are left untouched.
+        """
+        with self.connect() as conn:
+            self._insert(conn, tokens)
+
+    def _insert(self, conn, tokens):
+        placeholders = ', '.join('?' * (len(self.TOKEN_COLUMNS) + 1))
+        conn.executemany(
+            'INSERT OR REPLACE INTO tokens (section, {}) VALUES ({})'
+            ''.format(', '.join(self.TOKEN_COLUMNS), placeholders),
+            self._get_rows(tokens)
+        )
+
+    def read_tokens(self):
+        cursor = self.connect().execute(
+            'SELECT {} FROM tokens WHERE section = ?'
+            ''.format(', '.join(self.TOKEN_COLUMNS)), (self.section,)
+        )
+        return {row[0]: dict(zip(self.TOKEN_COLUMNS, row)) for row in cursor}
+
+    def clear_tokens(self):
+        with self.connect() as conn:
+            conn.execute('DELETE FROM tokens WHERE section = ?',
+                         (self.section,))
+
+    def cache_stamp(self):
+        """
+        Used by TokenCache. With write-ahead logging, new writes land in the
+        -wal file rather than the database, so both files are checked.
+        """
+        stamp = []
+        for filename in (self.filename, self.filename + '-wal'):
+            try:
+                st = os.stat(filename)
+                stamp.append((st.st_mtime_ns, st.st_size, st.st_ino))
+            except OSError:
+                stamp.append(None)
+        return tuple(stamp)
+
+
+class MultiClientSQLiteTokenStorage(SQLiteTokenStorage):
+    """
+    An extension on SQLiteTokenStorage which stores tokens separately for
+    each client_id used for the app, like MultiClientTokenStorage.
+    """
+
+    def set_client_id(self, client_id):
+        self.section = client_id
@@ -1,9 +1,9 @@
 import time
-import copy
 import sys
+from collections.abc import KeysView, Mapping
 
 from fair_research_login.exc import (TokensExpired, ScopesMismatch,
-                                     InvalidTokenFormat)
+                                     InvalidTokenFormat, LoginException)
 
 string_types = str if sys.version_info.major == 3 else basestring  # noqa
 
@@ -13,18 +13,23 @@ REQUIRED_TOKEN_KEYS = {'access_token', 'expires_at_seconds', 'scope',
                        'resource_server'}
 
 
-def is_expired(token_set):
-    return time.time() >= token_set['expires_at_seconds']
+def is_expired(token_set, margin=0):
+    """
+    Returns True if the token set has expired, or will expire within
+    ``margin`` seconds.
+    """
+    return time.time() + margin >= token_set['expires_at_seconds']
 
 
-def check_expired(tokens):
+def check_expired(tokens, margin=0):
     """
     Returns a Token Group organized by:
     globus_sdk.auth.token_response.OAuthTokenResponse.by_resource_server
-    For all tokens in that group that are expired. Ignores whether there
-    is a refresh token attached to that token.
+    For all tokens in that group that are expired, or will expire within
+    ``margin`` seconds. Ignores whether there is a refresh token attached to
+    that token.
     """
-    expired = [rs for rs, tset in tokens.items() if is_expired(tset)]
+    expired = [rs for rs, tset in tokens.items() if is_expired(tset, margin)]
     if expired:
         raise TokensExpired(resource_servers=expired)
 
@@ -37,7 +42,18 @@ def get_scopes(tokens):
     return [item for sublist in scopes for item in sublist]
 
 
-def check_scopes(tokens, requested_scopes):
+def get_scope_index(tokens):
+    """
+    Return a dict mapping each scope to the resource server of the token
+    group which holds it, given a dict of tokens grouped by resource server.
+    Building the index once lets scope lookups avoid splitting every
+    group's scope string again.
+    """
+    return {scope: rs for rs, tset in tokens.items()
+            for scope in tset['scope'].split()}
+
+
+def check_scopes(tokens, requested_scopes, scope_index=None):
     """
     Returns true if scopes match the tokens passed in, false otherwise.
     **Parameters**
@@ -55,45 +71,105 @@ def check_scopes(tokens, requested_scopes):
                 'resource_server': 'auth.globus.org'
             }, ...
         }
+      ``scope_index`` (**dict**)
+      An optional index from get_scope_index(tokens), built if not given
     """
-    loaded_scopes = get_scopes(tokens)
-    diff = set(requested_scopes).difference(set(loaded_scopes))
+    if scope_index is None:
+        scope_index = get_scope_index(tokens)
+    diff = set(requested_scopes).difference(scope_index)
     if diff:
         raise ScopesMismatch('Requested scopes not found: {}. A login is '
                              'required.'.format(diff))
 
 
-def verify_token_group(tokens):
-    """Verifies a token group is a valid dict with valid values. Does NOT check
-    whether the token has expired or if the token(s) are invalid. Validation
-    is not absolutely strict and allows some deviance for values, for example
-    'refresh_token' may be any falsy value. If validation passes, a cleaned
-     dict is returned with the following values:
+class TokenGroup(Mapping):
+    """
+    An immutable, validated token group for a single resource server. Built
+    with ``TokenGroup.from_dict()``, which validates the dict once the same
+    way as verify_token_group(). Token groups behave like a read-only dict,
+    and to_dict() returns a plain dict copy for code which needs one.
+
+    Instances use __slots__, so holding many of them is cheap, and can be
+    shared freely since they cannot be modified. Use replace() to create a
+    modified copy.
+    """
+    __slots__ = ('access_token', 'refresh_token', 'expires_at_seconds',
+                 'scope', 'token_type', 'resource_server')
+
+    def __init__(self, access_token, expires_at_seconds, scope,
+                 resource_server, refresh_token=None, token_type='Bearer'):
+        """Creates a token group without validation. See from_dict()."""
+        set_attr = super(TokenGroup, self).__setattr__
+        set_attr('access_token', access_token)
+        set_attr('refresh_token', refresh_token)
+        set_attr('expires_at_seconds', expires_at_seconds)
+        set_attr('scope', scope)
+        set_attr('token_type', token_type)
+        set_attr('resource_server', resource_server)
+
+    @classmethod
+    def from_dict(cls, tokens):
+        """
+        Validate a token dict and return a TokenGroup. TokenGroups are
+        returned as-is, since they were validated when created.
+        """
+        if isinstance(tokens, TokenGroup):
+            return tokens
+        _check_token_keys(tokens)
+        _check_token_types(tokens)
+        try:
+            expires_at_seconds = int(tokens['expires_at_seconds'])
+        except ValueError:
+            raise InvalidTokenFormat('expires_at_seconds must be an integer',
+                                     code='invalid_type')
+        return cls(tokens['access_token'], expires_at_seconds,
+                   tokens['scope'], tokens['resource_server'],
+                   refresh_token=tokens.get('refresh_token') or None)
 
-    * access_token: A string
-    * refresh_token: A valid string or None
-    * scope: A string
-    * expires_at_seconds: An integer
-    * token_type: 'Bearer'
+    def replace(self, **changes):
+        """Return a new TokenGroup with the given values changed."""
+        values = self.to_dict()
+        values.update(changes)
+        return TokenGroup(**values)
 
-    The following validation asserts the following:
+    def to_dict(self):
+        return {key: getattr(self, key) for key in self.__slots__}
 
-    * tokens is a dict
-    * tokens contains no more than the following:
-     {'access_token', 'refresh_token', 'expires_at_seconds',
-     'scope', 'token_type', 'resource_server'}
-    * The token group contains no less than the following:
-     {'access_token', 'expires_at_seconds', 'scope', 'resource_server'}
-    * 'access_token' and 'scope' must be strings
-    * 'token_type' is 'Bearer' if it is present
-    * 'refresh_token' must be falsy or a string.
-    * 'expires_at_seconds' must be an integer or parsable integer
-        * valid examples include: 123, '123', 123.456
-        * invalid examples include: 'abc', '123abc'
+    def __getitem__(self, key):
+        if key not in TOKEN_GROUP_KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
 
-    """
-    cleaned = copy.deepcopy(tokens)
+    def keys(self):
+        return KeysView(self)
+
+    def __iter__(self):
+        return iter(self.__slots__)
+
+    def __len__(self):
+        return len(self.__slots__)
+
+    def __setattr__(self, key, value):
+        raise AttributeError('TokenGroup is immutable, use replace()')
+
+    def __reduce__(self):
+        # Pickle through __init__, since __setattr__ cannot restore slots
+        return (TokenGroup, (self.access_token, self.expires_at_seconds,
+                             self.scope, self.resource_server,
+                             self.refresh_token, self.token_type))
 
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self):
+        return 'TokenGroup({!r}, scope={!r}, expires_at_seconds={})'.format(
+            self.resource_server, self.scope, self.expires_at_seconds)
+
+
+def _check_token_keys(tokens):
     if not isinstance(tokens, dict):
         raise InvalidTokenFormat('Tokens must be a dict.', code='not_dict')
     tk_set = set(tokens.keys())
@@ -106,29 +182,53 @@ def verify_token_group(tokens):
         raise InvalidTokenFormat('Missing required values: {}'.format(
             REQUIRED_TOKEN_KEYS.difference(tk_set)), code='missing_required')
 
+
+def _check_token_types(tokens):
     for tp in ['access_token', 'scope', 'resource_server']:
         if not isinstance(tokens.get(tp, ''), string_types):
             raise InvalidTokenFormat('{} must be a string.'.format(tp),
                                      code='invalid_type')
-        cleaned[tp] = tokens[tp]
 
     if tokens.get('token_type') and tokens['token_type'] != 'Bearer':
         raise InvalidTokenFormat('token_type must be "Bearer"',
                                  code='invalid_token_type')
-    cleaned['token_type'] = 'Bearer'
 
     rt = tokens.get('refresh_token')
     if rt and not isinstance(rt, string_types):
         raise InvalidTokenFormat('refresh_token must be a str or falsy',
                                  code='invalid_type')
-    cleaned['refresh_token'] = rt or None
 
-    try:
-        cleaned['expires_at_seconds'] = int(tokens['expires_at_seconds'])
-    except ValueError:
-        raise InvalidTokenFormat('expires_at_seconds must be an integer',
-                                 code='invalid_type')
-    return cleaned
+
+def verify_token_group(tokens):
+    """Verifies a token group is a valid dict with valid values. Does NOT check
+    whether the token has expired or if the token(s) are invalid. Validation
+    is not absolutely strict and allows some deviance for values, for example
+    'refresh_token' may be any falsy value. If validation passes, a cleaned
+     dict is returned with the following values:
+
+    * access_token: A string
+    * refresh_token: A valid string or None
+    * scope: A string
+    * expires_at_seconds: An integer
+    * token_type: 'Bearer'
+
+    The following validation asserts the following:
+
+    * tokens is a dict
+    * tokens contains no more than the following:
+     {'access_token', 'refresh_token', 'expires_at_seconds',
+     'scope', 'token_type', 'resource_server'}
+    * The token group contains no less than the following:
+     {'access_token', 'expires_at_seconds', 'scope', 'resource_server'}
+    * 'access_token' and 'scope' must be strings
+    * 'token_type' is 'Bearer' if it is present
+    * 'refresh_token' must be falsy or a string.
+    * 'expires_at_seconds' must be an integer or parsable integer
+        * valid examples include: 123, '123', 123.456
+        * invalid examples include: 'abc', '123abc'
+
+    """
+    return TokenGroup.from_dict(tokens).to_dict()
 
 
 def default_name_key(group_key, key):
@@ -226,3 +326,51 @@ def flat_unpack(flat_tokens, fetch_key=default_fetch_key):
     # server. This shouldn't matter if we only rely on the key for fetching
     # items and use the stored value in 'resource_server' for the real name
     return {tset['resource_server']: tset for tset in token_sets.values()}
+
+
+def is_token_key(key, fetch_key=default_fetch_key):
+    """Returns True if ``key`` could have been written by flat_pack()."""
+    try:
+        return fetch_key(key)[1] in TOKEN_GROUP_KEYS
+    except ValueError:
+        return False
+
+
+def compact_flat_tokens(flat_tokens, max_age=None, now=None,
+                        fetch_key=default_fetch_key):
+    """
+    Remove dead tokens from a dict of flat tokens, as created by
+    flat_pack(). Removes token groups which have expired and cannot be
+    refreshed, and keys which do not belong to a valid token group. If
+    ``max_age`` is set and the newest token expired more than ``max_age``
+    seconds ago, the tokens have not been saved or refreshed in that time
+    and all of them are removed.
+
+    Returns a tuple of the remaining flat tokens, the number of token groups
+    removed, and the number of other keys removed.
+    """
+    now = now or time.time()
+    groups, stray_keys = {}, []
+    for fkey, fvalue in flat_tokens.items():
+        if not is_token_key(fkey, fetch_key=fetch_key):
+            stray_keys.append(fkey)
+            continue
+        groups.setdefault(fetch_key(fkey)[0], {})[fkey] = fvalue
+
+    live, dead, latest = {}, 0, None
+    for flat_group in groups.values():
+        try:
+            tset = flat_unpack(flat_group, fetch_key=fetch_key)
+            token_group = TokenGroup.from_dict(list(tset.values())[0])
+        except (ValueError, KeyError, LoginException):
+            stray_keys.extend(flat_group)
+            continue
+        latest = max(latest or 0, token_group.expires_at_seconds)
+        if token_group.refresh_token is None and is_expired(token_group):
+            dead += 1
+        else:
+            live.update(flat_group)
+    if live and max_age is not None and latest + max_age < now:
+        dead += len({fetch_key(fkey)[0] for fkey in live})
+        live = {}
+    return live, dead, len(stray_keys)
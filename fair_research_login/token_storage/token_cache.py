@@ -0,0 +1,83 @@
+import os
+import threading
+
+
+class TokenCache(object):
+    """
+    An in-memory cache of verified tokens which sits in front of a token
+    storage object, so repeated loads in a long running process do not need
+    to re-read and re-parse the backing file. Entries are keyed by the
+    storage filename and section (The client_id for MultiClientTokenStorage),
+    and are discarded when the file's modification time, size, or inode
+    change. Storage objects without a ``filename`` are only invalidated
+    explicitly, which NativeClient does on save_tokens() and logout().
+
+    Storage objects may define a ``cache_stamp()`` method returning any
+    comparable value which changes when the stored tokens change, to be used
+    in place of checking the file.
+
+    A single TokenCache may be shared by any number of NativeClients.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_key(storage):
+        filename = getattr(storage, 'filename', None)
+        return filename or id(storage), getattr(storage, 'section', None)
+
+    @staticmethod
+    def get_stamp(storage):
+        """Return a value which changes when the storage contents change."""
+        cache_stamp = getattr(storage, 'cache_stamp', None)
+        if cache_stamp is not None:
+            return cache_stamp()
+        filename = getattr(storage, 'filename', None)
+        if filename is None:
+            return None
+        try:
+            st = os.stat(filename)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size, st.st_ino
+
+    def load(self, storage, loader):
+        """
+        Return tokens for ``storage`` from the cache, calling ``loader()`` to
+        fetch them if they are missing or stale. The value returned by
+        ``loader()`` is shared between calls and must not be modified, so it
+        should contain immutable groups such as TokenGroups.
+        """
+        key, stamp = self.get_key(storage), self.get_stamp(storage)
+        tokens = self._lookup(key, stamp)
+        if tokens is None:
+            # The stamp is taken before loading, so a write which lands
+            # during the load will be caught on the next call.
+            tokens = loader()
+            with self._lock:
+                self._entries[key] = (stamp, tokens)
+        return tokens
+
+    def peek(self, storage):
+        """
+        Return cached tokens for ``storage`` if they are fresh, otherwise
+        None. Storage is never read, only checked for changes.
+        """
+        return self._lookup(self.get_key(storage), self.get_stamp(storage))
+
+    def _lookup(self, key, stamp):
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry[0] == stamp:
+            return entry[1]
+        return None
+
+    def invalidate(self, storage):
+        with self._lock:
+            self._entries.pop(self.get_key(storage), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
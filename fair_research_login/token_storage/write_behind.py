@@ -0,0 +1,161 @@
+import atexit
+import logging
+import threading
+import weakref
+
+from fair_research_login.token_storage.token_cache import TokenCache
+
+log = logging.getLogger(__name__)
+
+
+# Storage with tokens which may need writing when the interpreter exits
+_instances = weakref.WeakSet()
+
+
+def _flush_all():
+    for storage in list(_instances):
+        try:
+            storage.flush()
+        except Exception as e:
+            log.warning('Failed to write pending tokens: {}'.format(e))
+
+
+atexit.register(_flush_all)
+
+
+class WriteBehindTokenStorage(object):
+    """
+    Wraps another token storage object, keeping saved tokens in memory and
+    writing them to the wrapped storage in batches. Updates for the same
+    resource server are coalesced, so many refreshes in a short time cost
+    a single write. Reads include tokens which have not been written yet.
+
+    Pending tokens are written ``delay`` seconds after the first unwritten
+    update, as soon as ``max_pending`` resource servers are waiting, when
+    flush() is called, and when the interpreter exits. Callers which must
+    know tokens are on disk, such as after a login, should call flush().
+    Tokens which have not been written are lost if the process is killed,
+    and are not seen by other processes sharing the storage, which may
+    refresh the same tokens again.
+
+    .. code-block:: python
+
+        storage = WriteBehindTokenStorage(MultiClientTokenStorage())
+        cli = NativeClient(client_id='my_id', token_storage=storage)
+
+    :param storage: The token storage to write to
+    :param delay: Seconds to wait before writing pending tokens
+    :param max_pending: Write immediately once tokens for this many resource
+        servers are pending
+    """
+    DELAY = 1.0
+    MAX_PENDING = 100
+
+    def __init__(self, storage, delay=None, max_pending=None):
+        self.storage = storage
+        self.delay = self.DELAY if delay is None else delay
+        self.max_pending = max_pending or self.MAX_PENDING
+        self._pending = {}
+        # True if pending tokens replace all saved tokens when written
+        self._replace = False
+        # Changes whenever pending tokens do, see cache_stamp()
+        self._generation = 0
+        self._lock = threading.RLock()
+        self._timer = None
+        _instances.add(self)
+
+    @property
+    def filename(self):
+        return getattr(self.storage, 'filename', None)
+
+    @property
+    def section(self):
+        return getattr(self.storage, 'section', None)
+
+    def set_client_id(self, client_id):
+        # Pending tokens belong to the previous client
+        self.flush()
+        if hasattr(self.storage, 'set_client_id'):
+            self.storage.set_client_id(client_id)
+
+    def cache_stamp(self):
+        return TokenCache.get_stamp(self.storage), self._generation
+
+    @property
+    def pending(self):
+        """A copy of tokens which have not been written yet."""
+        with self._lock:
+            return dict(self._pending)
+
+    def read_tokens(self):
+        with self._lock:
+            if self._replace:
+                return dict(self._pending)
+            tokens = dict(self.storage.read_tokens() or {})
+            tokens.update(self._pending)
+            return tokens
+
+    def write_tokens(self, tokens):
+        """Replace all saved tokens with ``tokens``, once written."""
+        with self._lock:
+            self._pending = dict(tokens)
+            self._replace = True
+            self._schedule()
+
+    def update_tokens(self, tokens):
+        """Merge ``tokens`` into saved tokens, once written."""
+        with self._lock:
+            self._pending.update(tokens)
+            self._schedule()
+
+    def clear_tokens(self):
+        """Discard pending tokens and clear the wrapped storage right away."""
+        with self._lock:
+            self._cancel()
+            self._pending, self._replace = {}, False
+            self._generation += 1
+            self.storage.clear_tokens()
+
+    def flush(self):
+        """Write all pending tokens to the wrapped storage now."""
+        with self._lock:
+            self._cancel()
+            if not self._pending and not self._replace:
+                return
+            if self._replace:
+                self.storage.write_tokens(self._pending)
+            elif hasattr(self.storage, 'update_tokens'):
+                self.storage.update_tokens(self._pending)
+            else:
+                tokens = dict(self.storage.read_tokens() or {})
+                tokens.update(self._pending)
+                self.storage.write_tokens(tokens)
+            self._pending, self._replace = {}, False
+            self._generation += 1
+
+    def _schedule(self):
+        self._generation += 1
+        if len(self._pending) >= self.max_pending or self.delay <= 0:
+            self.flush()
+        elif self._timer is None:
+            self._start_timer()
+
+    def _start_timer(self):
+        self._timer = threading.Timer(self.delay, self._flush_later)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _cancel(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _flush_later(self):
+        try:
+            self.flush()
+        except Exception as e:
+            # Pending tokens are kept, try again after another delay
+            log.warning('Failed to write pending tokens: {}'.format(e))
+            with self._lock:
+                if self._timer is None and (self._pending or self._replace):
+                    self._start_timer()
@@ -0,0 +1,3 @@
+from tests.benchmarks.bench import main
+
+main()
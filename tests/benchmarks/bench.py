@@ -0,0 +1,244 @@
+"""
+Benchmarks for the token load, save and refresh paths. Run with:
+
+    python -m tests.benchmarks [--quick] [--filter NAME] [--json FILE]
+
+Each benchmark is run over a range of resource server counts, client
+sections sharing one storage file, and storage backends. Results report
+operations per second, and the peak memory allocated during one operation
+as measured by tracemalloc. Refreshes are sent to a local mock of the
+Globus Auth token endpoint.
+"""
+import argparse
+import itertools
+import json
+import os
+import tempfile
+import time
+import timeit
+import tracemalloc
+from functools import partial
+
+from fair_research_login import (
+    NativeClient, JSONTokenStorage, MultiClientTokenStorage,
+    MultiClientSQLiteTokenStorage, MultiClientBinaryTokenStorage
+)
+from fair_research_login.token_storage import (
+    flat_pack, flat_unpack, verify_token_group
+)
+from tests.benchmarks.mock_auth import MockAuthServer, make_refresh_token
+
+CLIENT_ID = 'benchmark-client'
+RESOURCE_SERVERS = (1, 10, 100)
+SECTIONS = (1, 10, 100)
+MAX_WORKERS = (1, 8)
+QUICK_RESOURCE_SERVERS = (1, 10)
+QUICK_SECTIONS = (1, 10)
+
+BACKENDS = {
+    'json': JSONTokenStorage,
+    'configparser': MultiClientTokenStorage,
+    'sqlite': MultiClientSQLiteTokenStorage,
+    'binary': MultiClientBinaryTokenStorage,
+}
+
+
+def make_tokens(resource_servers, expired=False):
+    """Return a dict of valid tokens for ``resource_servers`` servers."""
+    expires_at = 0 if expired else int(time.time()) + 172800
+    tokens = {}
+    for num in range(resource_servers):
+        rs = 'rs{}.example.org'.format(num)
+        tokens[rs] = {
+            'scope': 'scope:{} scope:{}:extra'.format(rs, rs),
+            'access_token': 'access:{}'.format(rs),
+            'refresh_token': make_refresh_token(rs),
+            'token_type': 'Bearer',
+            'expires_at_seconds': expires_at,
+            'resource_server': rs,
+        }
+    return tokens
+
+
+def make_storage(backend, directory, resource_servers, sections):
+    """
+    Create storage for ``backend`` holding tokens for CLIENT_ID, plus
+    ``sections - 1`` other clients.
+    """
+    storage = BACKENDS[backend](filename=os.path.join(
+        directory, '{}-{}-{}'.format(backend, resource_servers, sections)))
+    tokens = make_tokens(resource_servers)
+    for num in range(sections - 1):
+        storage.set_client_id('client-{}'.format(num))
+        storage.write_tokens(tokens)
+    if hasattr(storage, 'set_client_id'):
+        storage.set_client_id(CLIENT_ID)
+    storage.write_tokens(tokens)
+    return storage
+
+
+class Context(object):
+    """
+    Shared state for benchmarks. Storage is created on first use and
+    reused, since filling many sections is slow for some backends.
+    """
+
+    def __init__(self, directory, sizes, server):
+        self.directory = directory
+        self.resource_servers, self.sections = sizes
+        self.server = server
+        self._storage = {}
+
+    def get_storage(self, backend, resource_servers, sections):
+        key = backend, resource_servers, sections
+        if key not in self._storage:
+            self._storage[key] = make_storage(backend, self.directory,
+                                              resource_servers, sections)
+        return self._storage[key]
+
+    def get_storage_params(self):
+        """Yield (backend, resource_servers, sections) to benchmark."""
+        for backend, rs, sec in itertools.product(
+                BACKENDS, self.resource_servers, self.sections):
+            # JSONTokenStorage keeps a single set of tokens per file
+            if backend != 'json' or sec == 1:
+                yield backend, rs, sec
+
+
+# Each benchmark yields (name, params, setup), where setup() returns the
+# function to be timed. Setup is skipped for filtered benchmarks.
+
+def bench_storage_tools(ctx):
+    for rs in ctx.resource_servers:
+        tokens = make_tokens(rs)
+        params = {'resource_servers': rs}
+        yield 'flat_pack', params, lambda t=tokens: partial(flat_pack, t)
+        yield ('flat_unpack', params,
+               lambda t=tokens: partial(flat_unpack, flat_pack(t)))
+    group = make_tokens(1)['rs0.example.org']
+    yield ('verify_token_group', {},
+           lambda: partial(verify_token_group, group))
+
+
+def bench_storage(ctx):
+    for backend, rs, sec in ctx.get_storage_params():
+        params = {'backend': backend, 'resource_servers': rs,
+                  'sections': sec}
+        storage = partial(ctx.get_storage, backend, rs, sec)
+        yield 'read_tokens', params, lambda s=storage: s().read_tokens
+        yield ('write_tokens', params,
+               lambda s=storage, rs=rs: partial(s().write_tokens,
+                                                make_tokens(rs)))
+
+
+def bench_bulk(ctx):
+    for rs, sec in itertools.product(ctx.resource_servers, ctx.sections):
+        params = {'backend': 'configparser', 'resource_servers': rs,
+                  'sections': sec}
+        clients = [CLIENT_ID] + ['client-{}'.format(n)
+                                 for n in range(sec - 1)]
+
+        def setup(rs=rs, sec=sec, clients=clients):
+            storage = ctx.get_storage('configparser', rs, sec)
+            return partial(storage.read_tokens_by_client, clients)
+        yield 'read_tokens_by_client', params, setup
+
+
+def bench_client(ctx):
+    for backend, rs, sec in ctx.get_storage_params():
+        params = {'backend': backend, 'resource_servers': rs,
+                  'sections': sec}
+        storage = partial(ctx.get_storage, backend, rs, sec)
+
+        def load(s=storage, token_cache=None):
+            return NativeClient(client_id=CLIENT_ID, token_storage=s(),
+                                token_cache=token_cache).load_tokens
+
+        def save(s=storage):
+            cli = NativeClient(client_id=CLIENT_ID, token_storage=s())
+            return partial(cli.save_tokens, make_tokens(1))
+        yield 'load_tokens', params, load
+        yield 'load_tokens cached', params, partial(load, token_cache=True)
+        yield 'save_tokens', params, save
+
+
+def bench_refresh(ctx):
+    for rs, workers in itertools.product(ctx.resource_servers, MAX_WORKERS):
+        params = {'resource_servers': rs, 'max_workers': workers}
+
+        def setup(rs=rs, workers=workers):
+            cli = NativeClient(client_id=CLIENT_ID, token_storage=None,
+                               base_url=ctx.server.base_url,
+                               max_workers=workers)
+            expired = make_tokens(rs, expired=True)
+            # Tokens are refreshed in place, so refresh a new copy each time
+            return lambda: cli.refresh_tokens(
+                {name: dict(ts) for name, ts in expired.items()})
+        yield 'refresh_tokens', params, setup
+
+
+def measure(func, quick=False, repeat=3):
+    """
+    Return operations per second for ``func``, and the peak bytes allocated
+    during a single call.
+    """
+    timer = timeit.Timer(func)
+    if quick:
+        number, repeat = 1, 1
+    else:
+        number, _ = timer.autorange()
+    best = min(timer.repeat(repeat=repeat, number=number)) / number
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return 1 / best if best else float('inf'), peak
+
+
+def format_params(params):
+    return ' '.join('{}={}'.format(k, v) for k, v in params.items())
+
+
+def run(quick=False, name_filter=None, latency=0, out=print):
+    """Run all benchmarks and return a list of results."""
+    sizes = ((QUICK_RESOURCE_SERVERS, QUICK_SECTIONS) if quick else
+             (RESOURCE_SERVERS, SECTIONS))
+    results = []
+    out('{:<22} {:<50} {:>12} {:>10}'.format('benchmark', 'params',
+                                             'ops/sec', 'peak KiB'))
+    with tempfile.TemporaryDirectory() as directory, \
+            MockAuthServer(latency=latency) as server:
+        ctx = Context(directory, sizes, server)
+        benchmarks = itertools.chain(bench_storage_tools(ctx),
+                                     bench_storage(ctx), bench_bulk(ctx),
+                                     bench_client(ctx), bench_refresh(ctx))
+        for name, params, setup in benchmarks:
+            if name_filter and name_filter not in name:
+                continue
+            ops, peak = measure(setup(), quick=quick)
+            results.append({'name': name, 'params': params,
+                            'ops_per_sec': ops, 'peak_bytes': peak})
+            out('{:<22} {:<50} {:>12.1f} {:>10.1f}'.format(
+                name, format_params(params), ops, peak / 1024))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--quick', action='store_true',
+                        help='Run each benchmark once at small sizes')
+    parser.add_argument('--filter', dest='name_filter',
+                        help='Only run benchmarks with names containing this')
+    parser.add_argument('--latency', type=float, default=0,
+                        help='Seconds the mock token endpoint waits to reply')
+    parser.add_argument('--json', dest='json_file',
+                        help='Also write results to this file')
+    args = parser.parse_args(argv)
+    results = run(quick=args.quick, name_filter=args.name_filter,
+                  latency=args.latency)
+    if args.json_file:
+        with open(args.json_file, 'w') as fh:
+            json.dump(results, fh, indent=2)
+    return results
@@ -0,0 +1,91 @@
+"""
+A local stand-in for the Globus Auth token endpoint, so refreshes can be
+benchmarked without network access or real credentials.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+TOKEN_PATH = '/v2/oauth2/token'
+
+
+def make_refresh_token(resource_server):
+    return 'refresh:{}'.format(resource_server)
+
+
+class TokenHandler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        form = parse_qs(self.rfile.read(length).decode('utf-8'))
+        refresh_token = form.get('refresh_token', [''])[0]
+        if (self.path != TOKEN_PATH or
+                form.get('grant_type') != ['refresh_token'] or
+                not refresh_token.startswith('refresh:')):
+            return self.respond(400, {'error': 'invalid_grant'})
+        self.server.requests += 1
+        resource_server = refresh_token.split(':', 1)[1]
+        self.respond(200, {
+            'access_token': 'access:{}:{}'.format(resource_server,
+                                                  self.server.requests),
+            'expires_in': 172800,
+            'resource_server': resource_server,
+            'scope': 'scope:{}'.format(resource_server),
+            'token_type': 'Bearer',
+            'refresh_token': refresh_token,
+            'other_tokens': [],
+        })
+
+    def respond(self, status, body):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class MockAuthServer(object):
+    """
+    Serve refresh grants on a random local port. Each refresh token is
+    ``refresh:<resource_server>``, see make_refresh_token(). Use as a context
+    manager, and pass ``base_url`` to NativeClient.
+
+    :param latency: Seconds to wait before answering each request
+    """
+
+    def __init__(self, latency=0):
+        self.latency = latency
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), TokenHandler)
+        self.server.requests = 0
+        self.server.daemon_threads = True
+        if latency:
+            handle = self.server.finish_request
+
+            def finish_request(*args):
+                time.sleep(self.latency)
+                handle(*args)
+            self.server.finish_request = finish_request
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       daemon=True)
+
+    @property
+    def base_url(self):
+        return 'http://{}:{}'.format(*self.server.server_address)
+
+    @property
+    def requests(self):
+        return self.server.requests
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
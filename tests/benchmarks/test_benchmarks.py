@@ -0,0 +1,26 @@
+from tests.benchmarks.bench import run, make_tokens
+from tests.benchmarks.mock_auth import MockAuthServer
+from fair_research_login import NativeClient
+
+
+def test_mock_auth_server_refreshes_tokens():
+    with MockAuthServer() as server:
+        cli = NativeClient(client_id='benchmark-client', token_storage=None,
+                           base_url=server.base_url)
+        tokens = make_tokens(2, expired=True)
+        cli.refresh_tokens(tokens)
+        assert server.requests == 2
+    for rs, ts in tokens.items():
+        assert ts['access_token'].startswith('access:{}'.format(rs))
+        assert ts['expires_at_seconds'] > 0
+
+
+def test_benchmarks_run():
+    lines = []
+    results = run(quick=True, out=lines.append)
+    assert len(lines) == len(results) + 1
+    names = {r['name'] for r in results}
+    assert {'flat_pack', 'read_tokens', 'load_tokens', 'save_tokens',
+            'refresh_tokens'}.issubset(names)
+    for result in results:
+        assert result['ops_per_sec'] > 0
@@ -0,0 +1,111 @@
+import asyncio
+from uuid import uuid4
+
+import globus_sdk
+import pytest
+
+from fair_research_login import AsyncNativeClient, NativeClient
+from fair_research_login.exc import TokensExpired, RevocationFailed
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_async_client_wraps_native_client(mem_storage):
+    cli = AsyncNativeClient(client_id=str(uuid4()), token_storage=mem_storage)
+    assert isinstance(cli.native_client, NativeClient)
+    native = NativeClient(client_id=str(uuid4()), token_storage=mem_storage)
+    assert AsyncNativeClient(native_client=native).native_client is native
+
+
+def test_async_load_tokens(mem_storage, mock_tokens):
+    mem_storage.tokens = mock_tokens
+    cli = AsyncNativeClient(client_id=str(uuid4()), token_storage=mem_storage)
+
+    async def load_many():
+        return await asyncio.gather(*[cli.load_tokens() for _ in range(10)])
+
+    for tokens in run(load_many()):
+        assert tokens == mock_tokens
+    assert len(run(cli.load_tokens_by_scope())) == 5
+    assert len(run(cli.get_authorizers())) == 3
+    assert len(run(cli.get_authorizers_by_scope())) == 5
+
+
+def test_async_refresh_tokens(expired_tokens_with_refresh,
+                              mock_refresh_token_authorizer):
+    cli = AsyncNativeClient(client_id=str(uuid4()), token_storage=None)
+    tokens = run(cli.refresh_tokens(expired_tokens_with_refresh))
+    for tset in tokens.values():
+        assert tset['access_token'] == '<Refreshed Access Token>'
+
+
+def test_async_refresh_invalid_grant(expired_tokens_with_refresh,
+                                     refresh_authorizer_raises_invalid_grant):
+    cli = AsyncNativeClient(client_id=str(uuid4()), token_storage=None)
+    with pytest.raises(TokensExpired) as te:
+        run(cli.refresh_tokens(expired_tokens_with_refresh))
+    assert set(te.value.resource_servers) == set(expired_tokens_with_refresh)
+
+
+def test_async_save_and_logout(mem_storage, mock_tokens, mock_revoke):
+    cli = AsyncNativeClient(client_id=str(uuid4()), token_storage=mem_storage,
+                            token_cache=True)
+    run(cli.save_tokens(mock_tokens))
+    assert run(cli.load_tokens()) == mock_tokens
+    run(cli.logout())
+    assert mock_revoke.called
+    assert mem_storage.tokens == {}
+
+
+def test_async_logout_clears_tokens_if_revocation_fails(
+        mem_storage, mock_tokens, mock_revoke):
+    mock_revoke.side_effect = globus_sdk.GlobusError()
+    mem_storage.tokens = mock_tokens
+    cli = AsyncNativeClient(client_id=str(uuid4()), token_storage=mem_storage)
+    with pytest.raises(RevocationFailed):
+        run(cli.logout())
+    assert mem_storage.tokens == {}
+
+
+def test_async_login(mem_storage, mock_tokens):
+    cli = AsyncNativeClient(client_id=str(uuid4()), token_storage=mem_storage)
+    mem_storage.tokens = mock_tokens
+    assert run(cli.login()) == mock_tokens
+
+
+def test_async_cached_tokens_skip_executor(mem_storage, mock_tokens):
+    mem_storage.tokens = mock_tokens
+    cli = AsyncNativeClient(client_id=str(uuid4()), token_storage=mem_storage,
+                            token_cache=True)
+    assert run(cli.load_tokens()) == mock_tokens
+
+    async def no_executor(*args, **kwargs):
+        raise AssertionError('Cached tokens should not use the executor')
+
+    cli.run = no_executor
+    assert run(cli.load_tokens()) == mock_tokens
+    assert len(run(cli.load_tokens_by_scope(['openid']))) == 3
+    authorizers = run(cli.get_authorizers())
+    assert run(cli.get_authorizers()) == authorizers
+    assert len(run(cli.get_authorizers_by_scope())) == 5
+
+
+def test_async_expired_tokens_use_executor(mem_storage,
+                                           expired_tokens_with_refresh,
+                                           mock_refresh_token_authorizer):
+    mem_storage.tokens = expired_tokens_with_refresh
+    cli = AsyncNativeClient(client_id=str(uuid4()), token_storage=mem_storage,
+                            token_cache=True)
+    calls = []
+    run_in_executor = cli.run
+
+    async def counting_run(*args, **kwargs):
+        calls.append(args[0])
+        return await run_in_executor(*args, **kwargs)
+
+    cli.run = counting_run
+    run(cli.load_tokens())
+    run(cli.load_tokens())
+    assert len(calls) == 2
@@ -0,0 +1,72 @@
+import os
+
+import pytest
+
+from fair_research_login.token_storage import (
+    BinaryTokenStorage, MultiClientBinaryTokenStorage
+)
+
+
+@pytest.fixture
+def binary_file(tmp_path):
+    return str(tmp_path / 'tokens.bin')
+
+
+def test_binary_storage_read_write(binary_file, mock_tokens):
+    storage = BinaryTokenStorage(filename=binary_file)
+    assert storage.read_tokens() == {}
+    storage.write_tokens(mock_tokens)
+    assert storage.read_tokens() == mock_tokens
+    assert os.stat(binary_file).st_mode & 0o777 == 0o600
+
+
+def test_binary_storage_update_tokens(binary_file, mock_tokens):
+    storage = BinaryTokenStorage(filename=binary_file)
+    storage.write_tokens({'auth.globus.org': mock_tokens['auth.globus.org']})
+    storage.update_tokens({'resource.server.org':
+                           mock_tokens['resource.server.org']})
+    assert set(storage.read_tokens()) == {'auth.globus.org',
+                                          'resource.server.org'}
+    storage.write_tokens({'auth.globus.org': mock_tokens['auth.globus.org']})
+    assert set(storage.read_tokens()) == {'auth.globus.org'}
+
+
+def test_binary_storage_sections(binary_file, mock_tokens,
+                                 mock_expired_tokens):
+    clients = ['a', 'a.b', 'ab', 'b']
+    storage = MultiClientBinaryTokenStorage(filename=binary_file)
+    for client_id in clients:
+        storage.set_client_id(client_id)
+        storage.write_tokens(mock_tokens)
+    storage.set_client_id('a')
+    storage.write_tokens(mock_expired_tokens)
+    storage.set_client_id('ab')
+    storage.clear_tokens()
+    expected = {'a': mock_expired_tokens, 'a.b': mock_tokens, 'ab': {},
+                'b': mock_tokens}
+    for client_id in clients:
+        reader = MultiClientBinaryTokenStorage(filename=binary_file)
+        reader.set_client_id(client_id)
+        assert reader.read_tokens() == expected[client_id]
+
+
+def test_binary_storage_notices_other_writers(binary_file, mock_tokens):
+    reader = BinaryTokenStorage(filename=binary_file)
+    writer = BinaryTokenStorage(filename=binary_file)
+    writer.write_tokens({'auth.globus.org': mock_tokens['auth.globus.org']})
+    assert set(reader.read_tokens()) == {'auth.globus.org'}
+    writer.write_tokens(mock_tokens)
+    assert reader.read_tokens() == mock_tokens
+
+
+def test_binary_storage_rejects_other_files(binary_file):
+    with open(binary_file, 'wb') as fh:
+        fh.write(b'[tokens]\nfoo = bar\n')
+    with pytest.raises(ValueError):
+        BinaryTokenStorage(filename=binary_file).read_tokens()
+
+
+def test_binary_record_round_trip(mock_tokens):
+    for token_group in mock_tokens.values():
+        record = BinaryTokenStorage.encode_record(token_group)
+        assert BinaryTokenStorage.decode_record(record) == token_group
@@ -0,0 +1,145 @@
+import os
+import shutil
+import tempfile
+
+import globus_sdk
+import pytest
+
+from fair_research_login import (
+    NativeClient, TokenBroker, BrokerTokenStorage, MultiClientTokenStorage
+)
+from fair_research_login.exc import BrokerError
+
+
+@pytest.fixture
+def socket_path():
+    # Unix socket paths are limited to around 100 characters, which pytest's
+    # tmp_path may exceed
+    directory = tempfile.mkdtemp()
+    yield os.path.join(directory, 'broker.sock')
+    shutil.rmtree(directory)
+
+
+@pytest.fixture
+def broker(socket_path, tmp_path):
+    filename = str(tmp_path / 'tokens.cfg')
+    broker = TokenBroker(socket_path, storage_factory=lambda:
+                         MultiClientTokenStorage(filename=filename))
+    broker.start()
+    yield broker
+    broker.shutdown()
+
+
+def test_broker_storage_read_write(broker, mock_tokens):
+    storage = BrokerTokenStorage(broker.socket_path, client_id='foo')
+    assert storage.read_tokens() == {}
+    storage.write_tokens(mock_tokens)
+    assert storage.read_tokens() == mock_tokens
+    storage.clear_tokens()
+    assert storage.read_tokens() == {}
+    storage.write_tokens({'auth.globus.org': mock_tokens['auth.globus.org']})
+    storage.update_tokens({'resource.server.org':
+                           mock_tokens['resource.server.org']})
+    assert set(storage.read_tokens()) == {'auth.globus.org',
+                                          'resource.server.org'}
+    assert os.stat(broker.socket_path).st_mode & 0o777 == 0o600
+
+
+def test_broker_separates_clients(broker, mock_tokens):
+    BrokerTokenStorage(broker.socket_path, 'foo').write_tokens(mock_tokens)
+    assert BrokerTokenStorage(broker.socket_path, 'bar').read_tokens() == {}
+    assert set(broker.clients) == {'foo', 'bar'}
+
+
+def test_native_client_with_broker(broker, mock_tokens):
+    cli = NativeClient(client_id='foo',
+                       token_storage=BrokerTokenStorage(broker.socket_path))
+    cli.save_tokens(mock_tokens)
+    assert cli.load_tokens() == mock_tokens
+
+
+def test_native_client_cache_sees_broker_updates(broker, mock_tokens):
+    cli = NativeClient(client_id='foo', token_cache=True,
+                       token_storage=BrokerTokenStorage(broker.socket_path))
+    cli.save_tokens(mock_tokens)
+    assert cli.load_tokens() == mock_tokens
+    new_tokens = dict(mock_tokens['auth.globus.org'],
+                      access_token='<New Access Token>')
+    BrokerTokenStorage(broker.socket_path, 'foo').update_tokens(
+        {'auth.globus.org': new_tokens})
+    assert cli.load_tokens()['auth.globus.org'] == new_tokens
+
+
+def test_broker_refreshes_tokens(broker, expired_tokens_with_refresh,
+                                 mock_refresh_token_authorizer):
+    storage = BrokerTokenStorage(broker.socket_path, 'foo')
+    storage.write_tokens(expired_tokens_with_refresh)
+    tokens = storage.read_tokens()
+    for tset in tokens.values():
+        assert tset['access_token'] == '<Refreshed Access Token>'
+    # The refreshed tokens were saved by the broker
+    reader = MultiClientTokenStorage(
+        filename=broker.clients['foo'].token_storage.filename)
+    reader.set_client_id('foo')
+    assert reader.read_tokens() == tokens
+
+
+def test_broker_returns_tokens_which_fail_to_refresh(
+        broker, expired_tokens_with_refresh,
+        refresh_authorizer_raises_invalid_grant):
+    storage = BrokerTokenStorage(broker.socket_path, 'foo')
+    storage.write_tokens(expired_tokens_with_refresh)
+    assert storage.read_tokens() == expired_tokens_with_refresh
+
+
+def test_broker_does_not_retry_rejected_refresh_tokens(
+        broker, expired_tokens_with_refresh,
+        refresh_authorizer_raises_invalid_grant):
+    ensure_valid_token = globus_sdk.RefreshTokenAuthorizer.ensure_valid_token
+    storage = BrokerTokenStorage(broker.socket_path, 'foo')
+    storage.write_tokens(expired_tokens_with_refresh)
+    assert storage.read_tokens() == expired_tokens_with_refresh
+    calls = ensure_valid_token.call_count
+    assert calls == len(expired_tokens_with_refresh)
+    storage.read_tokens()
+    assert ensure_valid_token.call_count == calls
+    new_tokens = dict(expired_tokens_with_refresh['auth.globus.org'],
+                      refresh_token='<New Refresh Token>')
+    storage.update_tokens({'auth.globus.org': new_tokens})
+    storage.read_tokens()
+    assert ensure_valid_token.call_count == calls + 1
+
+
+def test_broker_validates_written_tokens(broker, mock_tokens):
+    storage = BrokerTokenStorage(broker.socket_path, 'foo')
+    bad_tokens = {'auth.globus.org': dict(mock_tokens['auth.globus.org'],
+                                          access_token=None)}
+    with pytest.raises(BrokerError):
+        storage.write_tokens(bad_tokens)
+    assert storage.read_tokens() == {}
+
+
+def test_broker_socket_directory_is_clean(broker):
+    assert os.listdir(os.path.dirname(broker.socket_path)) == ['broker.sock']
+
+
+def test_broker_storage_reconnects(broker, mock_tokens):
+    storage = BrokerTokenStorage(broker.socket_path, 'foo')
+    storage.write_tokens(mock_tokens)
+    sock, _ = storage.connect()
+    sock.shutdown(2)
+    assert storage.read_tokens() == mock_tokens
+
+
+def test_broker_errors(broker, socket_path):
+    with pytest.raises(BrokerError):
+        BrokerTokenStorage(socket_path).read_tokens()
+    with pytest.raises(BrokerError):
+        BrokerTokenStorage(socket_path, 'foo').request('bad_op')
+    with pytest.raises(BrokerError):
+        TokenBroker(socket_path).bind()
+
+
+def test_broker_not_running(socket_path):
+    with pytest.raises(BrokerError):
+        BrokerTokenStorage(socket_path, 'foo').read_tokens()
@@ -1,3 +1,6 @@
+import os
+import threading
+import time
 from uuid import uuid4
 import pytest
 import globus_sdk
@@ -12,7 +15,7 @@ from fair_research_login.token_storage.configparser_token_storage import (
 from fair_research_login.local_server import LocalServerCodeHandler
 from fair_research_login.code_handler import InputCodeHandler
 from fair_research_login.exc import (
-    LoadError, ScopesMismatch, TokensExpired, AuthFailure
+    LoadError, ScopesMismatch, TokensExpired, AuthFailure, RevocationFailed
 )
 from fair_research_login.version import __version__
 
@@ -32,6 +35,50 @@ def test_client_defaults():
     assert isinstance(input_handler, InputCodeHandler)
 
 
+def test_client_default_storage_not_shared():
+    cli1 = NativeClient(client_id='client-one')
+    cli2 = NativeClient(client_id='client-two')
+    assert cli1.token_storage is not cli2.token_storage
+    assert cli1.token_storage.section == 'client-one'
+    assert cli2.token_storage.section == 'client-two'
+
+
+def test_client_creates_code_handlers_lazily():
+    cli = NativeClient(client_id=str(uuid4()))
+    assert cli._code_handlers is None
+    assert cli.code_handlers is cli.code_handlers
+
+
+def test_client_creates_sdk_client_lazily(mem_storage, mock_tokens):
+    cli = NativeClient(client_id=str(uuid4()), token_storage=mem_storage)
+    mem_storage.tokens = mock_tokens
+    cli.load_tokens()
+    assert cli._client is None
+    assert isinstance(cli.client, globus_sdk.NativeAppAuthClient)
+    assert cli.client is cli.client
+
+
+def test_client_connection_pool_size():
+    cli = NativeClient(client_id=str(uuid4()), token_storage=None)
+    adapter = cli.client.transport.session.get_adapter(cli.client.base_url)
+    assert adapter._pool_maxsize == NativeClient.DEFAULT_POOL_SIZE
+    cli = NativeClient(client_id=str(uuid4()), token_storage=None,
+                       max_workers=32)
+    adapter = cli.client.transport.session.get_adapter(cli.client.base_url)
+    assert adapter._pool_maxsize == 32
+    cli = NativeClient(client_id=str(uuid4()), token_storage=None,
+                       pool_size=4)
+    adapter = cli.client.transport.session.get_adapter(cli.client.base_url)
+    assert adapter._pool_maxsize == 4
+
+
+def test_client_authorizers_share_sdk_client(expired_tokens_with_refresh):
+    cli = NativeClient(client_id=str(uuid4()), token_storage=None)
+    authorizers = [cli.get_authorizer(ts)
+                   for ts in expired_tokens_with_refresh.values()]
+    assert all(a.auth_client is cli.client for a in authorizers)
+
+
 def test_client_login(mock_input, mock_webbrowser, mock_token_response,
                       mem_storage):
     cli = NativeClient(client_id=str(uuid4()),
@@ -116,17 +163,60 @@ def test_code_handler_auth_fail(monkeypatch, mock_input, mock_webbrowser,
         cli.login()
 
 
-def test_revoke_login(mock_revoke, mock_tokens):
+@pytest.fixture
+def unique_tokens(mock_tokens):
+    for rs, tset in mock_tokens.items():
+        tset['access_token'] = '<{} access token>'.format(rs)
+        tset['refresh_token'] = '<{} refresh token>'.format(rs)
+    return mock_tokens
+
+
+def test_revoke_login(mock_revoke, unique_tokens):
     cli = NativeClient(client_id=str(uuid4()))
+    cli.revoke_token_set(unique_tokens)
+    assert mock_revoke.call_count == 6
+
+
+def test_revoke_skips_empty_and_duplicate_tokens(mock_revoke, mock_tokens):
+    cli = NativeClient(client_id=str(uuid4()))
+    # All mock tokens share one access token and have no refresh tokens
     cli.revoke_token_set(mock_tokens)
+    mock_revoke.assert_called_once_with('<token>')
+
+
+def test_concurrent_revoke_reports_failures(mock_revoke, unique_tokens):
+    def revoke(token):
+        if 'transfer' in token:
+            raise globus_sdk.GlobusError()
+    mock_revoke.side_effect = revoke
+    cli = NativeClient(client_id=str(uuid4()), max_workers=4)
+    with pytest.raises(RevocationFailed) as rf:
+        cli.revoke_token_set(unique_tokens)
     assert mock_revoke.call_count == 6
+    assert set(rf.value.errors) == {
+        ('transfer.api.globus.org', 'access_token'),
+        ('transfer.api.globus.org', 'refresh_token'),
+    }
+    assert '<' not in str(rf.value)
 
 
-def test_logout(mock_revoke, mock_tokens, mem_storage):
+def test_logout(mock_revoke, unique_tokens, mem_storage):
     cli = NativeClient(client_id=str(uuid4()), token_storage=mem_storage)
-    mem_storage.tokens = mock_tokens
+    mem_storage.tokens = unique_tokens
     cli.logout()
     assert mock_revoke.call_count == 6
+    assert mem_storage.tokens == {}
+
+
+def test_logout_clears_tokens_if_revocation_fails(mock_revoke,
+                                                  unique_tokens, mem_storage):
+    mock_revoke.side_effect = globus_sdk.GlobusError()
+    cli = NativeClient(client_id=str(uuid4()), token_storage=mem_storage)
+    mem_storage.tokens = unique_tokens
+    with pytest.raises(RevocationFailed):
+        cli.logout()
+    assert mock_revoke.call_count == 6
+    assert mem_storage.tokens == {}
 
 
 def test_load_tokens(mem_storage, mock_tokens):
@@ -144,6 +234,26 @@ def test_load_tokens_by_scope(mem_storage, mock_tokens):
         'openid', 'profile', 'email', 'custom_scope',
         'urn:globus:auth:scope:transfer.api.globus.org:all'
     }
+    assert tokens['openid'] is tokens['profile']
+    assert tokens['openid'] == mock_tokens['auth.globus.org']
+
+
+def test_load_tokens_by_scope_with_requested_scopes(mem_storage,
+                                                    mock_tokens):
+    cli = NativeClient(client_id=str(uuid4()), token_storage=mem_storage)
+    mem_storage.tokens = mock_tokens
+    tokens = cli.load_tokens_by_scope(requested_scopes=['openid'])
+    assert set(tokens.keys()) == {'openid', 'profile', 'email'}
+
+
+def test_load_tokens_with_requested_scopes(mem_storage, mock_tokens):
+    cli = NativeClient(client_id=str(uuid4()), token_storage=mem_storage,
+                       token_cache=True)
+    mem_storage.tokens = mock_tokens
+    tokens = cli.load_tokens(requested_scopes='openid custom_scope')
+    assert set(tokens) == {'auth.globus.org', 'resource.server.org'}
+    with pytest.raises(ScopesMismatch):
+        cli.load_tokens(requested_scopes=['never_requested'])
 
 
 def test_load_no_tokens_raises_error(mem_storage):
@@ -341,6 +451,61 @@ def test_client_get_authorizers_by_scope(mock_tokens,
             assert isinstance(authorizer, globus_sdk.AccessTokenAuthorizer)
 
 
+def test_client_reuses_authorizers(mock_tokens, mem_storage):
+    mock_tokens['resource.server.org']['refresh_token'] = '<Refresh Token>'
+    mem_storage.tokens = mock_tokens
+    cli = NativeClient(client_id=str(uuid4()), token_storage=mem_storage)
+    authorizers = cli.get_authorizers()
+    assert cli.get_authorizers() == authorizers
+    by_scope = cli.get_authorizers_by_scope()
+    assert by_scope['openid'] is authorizers['auth.globus.org']
+    assert by_scope['openid'] is by_scope['email']
+    assert by_scope['custom_scope'] is authorizers['resource.server.org']
+
+    new_tokens = dict(mock_tokens['auth.globus.org'])
+    new_tokens['access_token'] = '<New Token>'
+    cli.save_tokens({'auth.globus.org': new_tokens})
+    new_authorizers = cli.get_authorizers()
+    assert new_authorizers['auth.globus.org'] is not \
+        authorizers['auth.globus.org']
+    assert new_authorizers['resource.server.org'] is \
+        authorizers['resource.server.org']
+
+
+def test_client_reuses_refreshed_authorizer(mock_tokens, mem_storage,
+                                            mock_refresh_token_authorizer):
+    mock_tokens['resource.server.org']['refresh_token'] = '<Refresh Token>'
+    mem_storage.tokens = mock_tokens
+    cli = NativeClient(client_id=str(uuid4()), token_storage=mem_storage)
+    rs_auth = cli.get_authorizers()['resource.server.org']
+    rs_auth.expires_at = 0
+    rs_auth.ensure_valid_token()
+    mem_storage.tokens['resource.server.org']['access_token'] = \
+        rs_auth.access_token
+    assert cli.get_authorizers()['resource.server.org'] is rs_auth
+
+
+def test_client_concurrent_saves_are_not_lost(mock_tokens, mem_storage,
+                                              monkeypatch):
+    write_tokens = mem_storage.write_tokens
+
+    def slow_write(tokens):
+        time.sleep(0.01)
+        write_tokens(tokens)
+    monkeypatch.setattr(mem_storage, 'write_tokens', slow_write)
+    cli = NativeClient(client_id=str(uuid4()), token_storage=mem_storage,
+                       token_cache=True)
+    group = mock_tokens['auth.globus.org']
+    threads = [threading.Thread(target=cli.save_tokens, args=(
+        {'rs{}'.format(num): dict(group, resource_server='rs{}'.format(num))},
+    )) for num in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(cli.load_tokens()) == 10
+
+
 def test_client_load_auto_refresh(expired_tokens_with_refresh, mem_storage,
                                   mock_refresh_token_authorizer):
     mem_storage.tokens = expired_tokens_with_refresh
@@ -398,15 +563,163 @@ def test_additional_params_raises_warning(monkeypatch, mock_input,
     log = Mock()
     monkeypatch.setattr(fair_research_login.client, 'log', log)
     cli = NativeClient(client_id=str(uuid4()), token_storage=None)
-    cli.login(additional_params={'foo': 'bar'})
+    cli.login(additional_params={'foo': 'bar'}, no_local_server=True)
     assert log.warning.called
 
 
 def test_globus_sdk_query_params(mock_sdk_oauth2_get_authorize_url,
                                  mock_input, mock_token_response):
     cli = NativeClient(client_id=str(uuid4()), token_storage=None)
-    cli.login(additional_params={'foo': 'bar'})
+    cli.login(additional_params={'foo': 'bar'}, no_local_server=True)
     assert mock_sdk_oauth2_get_authorize_url.called
     mock_sdk_oauth2_get_authorize_url.assert_called_with(
         query_params={'foo': 'bar'}
     )
+
+
+def test_client_concurrent_token_refresh(expired_tokens_with_refresh,
+                                         mock_refresh_token_authorizer):
+    cli = NativeClient(client_id=str(uuid4()), token_storage=None,
+                       max_workers=4)
+    tokens = cli.refresh_tokens(expired_tokens_with_refresh)
+    assert len(tokens) == 3
+    for tset in tokens.values():
+        assert tset['access_token'] == '<Refreshed Access Token>'
+
+
+def test_concurrent_refresh_reports_all_invalid_grants(
+        mem_storage, expired_tokens_with_refresh,
+        refresh_authorizer_raises_invalid_grant):
+    cli = NativeClient(client_id=str(uuid4()), token_storage=mem_storage,
+                       max_workers=4)
+    with pytest.raises(TokensExpired) as te:
+        cli.refresh_tokens(expired_tokens_with_refresh)
+    assert set(te.value.resource_servers) == set(expired_tokens_with_refresh)
+
+
+def test_load_tokens_saves_partial_refresh(monkeypatch, mem_storage,
+                                           expired_tokens_with_refresh,
+                                           mock_refresh_token_authorizer):
+    def refresh_group(self, resource_server, token_dict, margin=0):
+        token_dict['access_token'] = '<Refreshed Access Token>'
+        return resource_server != 'resource.server.org'
+    monkeypatch.setattr(NativeClient, '_refresh_token_group', refresh_group)
+    mem_storage.tokens = expired_tokens_with_refresh
+    cli = NativeClient(client_id=str(uuid4()), token_storage=mem_storage,
+                       max_workers=4)
+    with pytest.raises(TokensExpired) as te:
+        cli.load_tokens()
+    assert list(te.value.resource_servers) == ['resource.server.org']
+    saved = mem_storage.tokens
+    assert saved['auth.globus.org']['access_token'] == (
+        '<Refreshed Access Token>')
+
+
+@pytest.fixture
+def slow_refresh(monkeypatch):
+    calls = []
+
+    def refresh_group(self, resource_server, token_dict, margin=0):
+        calls.append(resource_server)
+        time.sleep(0.1)
+        token_dict['access_token'] = '<Refreshed Access Token>'
+        token_dict['expires_at_seconds'] = int(time.time()) + 60 * 60
+        return True
+    monkeypatch.setattr(NativeClient, '_refresh_token_group', refresh_group)
+    return calls
+
+
+def load_in_threads(clients):
+    results = []
+    threads = [threading.Thread(target=lambda c=c: results.append(
+        c.load_tokens())) for c in clients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_loads_share_one_refresh(mem_storage, slow_refresh,
+                                            expired_tokens_with_refresh):
+    mem_storage.tokens = expired_tokens_with_refresh
+    cli = NativeClient(client_id=str(uuid4()), token_storage=mem_storage)
+    results = load_in_threads([cli] * 4)
+    assert len(results) == 4
+    assert len(slow_refresh) == 3
+    for tokens in results:
+        for tset in tokens.values():
+            assert tset['access_token'] == '<Refreshed Access Token>'
+
+
+def test_refresh_coalesced_across_clients_sharing_a_file(
+        tmp_path, slow_refresh, expired_tokens_with_refresh):
+    filename = str(tmp_path / 'tokens.cfg')
+    client_id = str(uuid4())
+    clients = [NativeClient(client_id=client_id,
+                            token_storage=MultiClientTokenStorage(
+                                filename=filename, atomic=True))
+               for _ in range(4)]
+    clients[0].save_tokens(expired_tokens_with_refresh)
+    results = load_in_threads(clients)
+    assert len(results) == 4
+    assert len(slow_refresh) == 3
+    assert os.path.exists('{}.{}.refresh.lock'.format(filename, client_id))
+
+
+def test_refresh_lock_is_per_client(tmp_path, slow_refresh,
+                                    expired_tokens_with_refresh):
+    filename = str(tmp_path / 'tokens.cfg')
+    clients = [NativeClient(client_id=str(uuid4()),
+                            token_storage=MultiClientTokenStorage(
+                                filename=filename))
+               for _ in range(2)]
+    for cli in clients:
+        cli.save_tokens(expired_tokens_with_refresh)
+    # Another client refreshing tokens in the same file does not block
+    with clients[0]._get_storage_refresh_lock():
+        thread = threading.Thread(target=clients[1].load_tokens, daemon=True)
+        thread.start()
+        thread.join(timeout=10)
+        assert not thread.is_alive()
+    assert len(slow_refresh) == 3
+
+
+@pytest.fixture
+def nearly_expired_tokens(expired_tokens_with_refresh):
+    for tset in expired_tokens_with_refresh.values():
+        tset['expires_at_seconds'] = int(time.time()) + 30
+    return expired_tokens_with_refresh
+
+
+def test_load_tokens_expiry_margin_refreshes(mem_storage,
+                                             nearly_expired_tokens,
+                                             mock_refresh_token_authorizer):
+    mem_storage.tokens = nearly_expired_tokens
+    cli = NativeClient(client_id=str(uuid4()), token_storage=mem_storage,
+                       expiry_margin=120)
+    for tset in cli.load_tokens().values():
+        assert tset['access_token'] == '<Refreshed Access Token>'
+
+
+def test_load_tokens_per_call_expiry_margin(mem_storage,
+                                            nearly_expired_tokens,
+                                            mock_refresh_token_authorizer):
+    mem_storage.tokens = nearly_expired_tokens
+    cli = NativeClient(client_id=str(uuid4()), token_storage=mem_storage)
+    for tset in cli.load_tokens().values():
+        assert tset['access_token'] == '<token>'
+    authorizers = cli.get_authorizers(expiry_margin=120)
+    for authorizer in authorizers.values():
+        assert authorizer.access_token == '<Refreshed Access Token>'
+
+
+def test_expiry_margin_without_refresh_token(mem_storage, mock_tokens):
+    for tset in mock_tokens.values():
+        tset['expires_at_seconds'] = int(time.time()) + 30
+    mem_storage.tokens = mock_tokens
+    cli = NativeClient(client_id=str(uuid4()), token_storage=mem_storage,
+                       expiry_margin=120)
+    with pytest.raises(TokensExpired):
+        cli.load_tokens(requested_scopes=['openid'])
+    assert cli.load_tokens(requested_scopes=['openid'], expiry_margin=0)
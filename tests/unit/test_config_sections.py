@@ -0,0 +1,278 @@
+import configparser
+import os
+import time
+
+import pytest
+
+from fair_research_login.token_storage import (
+    ConfigParserTokenStorage, MultiClientTokenStorage, TokenGroup
+)
+from fair_research_login.exc import InvalidTokenFormat
+from fair_research_login.token_storage import config_sections
+from fair_research_login.token_storage.config_sections import (
+    build_index, read_section, read_sections, update_section,
+    update_sections, rewrite_sections
+)
+
+CONFIG = """[DEFAULT]
+shared = yes
+
+[one]
+a = 1
+long = first line
+  second line
+
+[two]
+b = 2
+"""
+
+
+@pytest.fixture
+def config_file(tmp_path):
+    filename = str(tmp_path / 'tokens.cfg')
+    with open(filename, 'w') as fh:
+        fh.write(CONFIG)
+    return filename
+
+
+def test_build_index():
+    index = build_index(CONFIG)
+    assert list(index) == ['DEFAULT', 'one', 'two']
+    start, end = index['one']
+    assert CONFIG[start:end].startswith('[one]\n')
+    assert CONFIG[index['two'][0]:index['two'][1]] == '[two]\nb = 2\n'
+    assert build_index(CONFIG.encode('utf-8'))['two'] == index['two']
+
+
+def test_build_index_duplicate_sections():
+    assert build_index('[one]\n[one]\n') is None
+
+
+def test_read_section(config_file):
+    config = configparser.ConfigParser()
+    config.read(config_file)
+    for section in ('one', 'two'):
+        assert read_section(config_file, section) == dict(
+            config.items(section))
+    assert read_section(config_file, 'missing') == {}
+    assert read_section(config_file + '.missing', 'one') == {}
+
+
+def test_read_section_duplicate_sections(tmp_path):
+    filename = str(tmp_path / 'tokens.cfg')
+    with open(filename, 'w') as fh:
+        fh.write('[one]\n[one]\n')
+    with pytest.raises(configparser.DuplicateSectionError):
+        read_section(filename, 'one')
+
+
+def test_read_section_uses_cached_index(config_file, monkeypatch):
+    read_section(config_file, 'one')
+    monkeypatch.setattr(config_sections, 'build_index', None)
+    assert read_section(config_file, 'two')['b'] == '2'
+
+
+def test_read_section_notices_changes(config_file):
+    assert read_section(config_file, 'two')['b'] == '2'
+    with open(config_file, 'w') as fh:
+        fh.write('[two]\nb = 3\n')
+    assert read_section(config_file, 'two')['b'] == '3'
+
+
+def test_update_section_copies_other_sections(config_file):
+    update_section(config_file, 'one', {'a': '5', 'c': '6'}, 0o600)
+    with open(config_file) as fh:
+        data = fh.read()
+    assert data.startswith('[DEFAULT]\nshared = yes\n\n[one]\n')
+    assert data.endswith('[two]\nb = 2\n')
+    one = read_section(config_file, 'one')
+    assert (one['a'], one['c'], one['long']) == ('5', '6',
+                                                 'first line\nsecond line')
+
+
+@pytest.mark.parametrize('atomic', [False, True])
+def test_update_section_adds_section(config_file, atomic):
+    with open(config_file, 'a') as fh:
+        fh.write('c = 3')
+    update_section(config_file, 'three', {'d': '4'}, 0o600, atomic=atomic)
+    assert read_section(config_file, 'two')['c'] == '3'
+    assert read_section(config_file, 'three')['d'] == '4'
+    assert os.stat(config_file).st_mode & 0o777 == 0o600
+
+
+def test_read_sections(config_file):
+    sections = read_sections(config_file, ['two', 'missing', 'one'])
+    assert set(sections) == {'one', 'two'}
+    assert sections['one']['shared'] == 'yes'
+    assert sections['two']['b'] == '2'
+    assert read_sections(config_file, ['missing']) == {}
+    assert read_sections(config_file + '.missing', ['one']) == {}
+
+
+def test_update_sections(config_file):
+    update_sections(config_file, {'two': {'b': '5'}, 'three': {'c': '6'},
+                                  'one': {'a': '7'}}, 0o600)
+    sections = read_sections(config_file, ['one', 'two', 'three'])
+    assert sections['one']['a'] == '7'
+    assert sections['one']['long'] == 'first line\nsecond line'
+    assert sections['two']['b'] == '5'
+    assert sections['three']['c'] == '6'
+    with open(config_file) as fh:
+        assert fh.read().startswith('[DEFAULT]\nshared = yes\n\n[one]\n')
+
+
+def test_update_sections_keeps_raw_options(config_file):
+    with open(config_file, 'a') as fh:
+        fh.write('percent = 100%%\n')
+    update_sections(config_file, {'one': {'a': '7'}, 'two': {'b': '5'}},
+                    0o600)
+    with open(config_file) as fh:
+        data = fh.read()
+    assert '[two]\nb = 5\npercent = 100%%\n' in data
+    assert data.count('shared') == 1
+    assert read_section(config_file, 'two')['percent'] == '100%'
+
+
+@pytest.mark.parametrize('atomic', [False, True])
+def test_update_sections_keeps_crlf(tmp_path, atomic):
+    filename = str(tmp_path / 'tokens.cfg')
+    data = CONFIG.replace('\n', '\r\n').encode()
+    with open(filename, 'wb') as fh:
+        fh.write(data)
+    update_sections(filename, {'two': {'b': '5'}, 'three': {'c': '6'}},
+                    0o600, atomic=atomic)
+    with open(filename, 'rb') as fh:
+        new_data = fh.read()
+    assert new_data.startswith(data[:data.index(b'[two]')])
+    assert new_data.endswith(b'[two]\r\nb = 5\r\n\r\n'
+                             b'[three]\r\nc = 6\r\n\r\n')
+    assert b'\n' not in new_data.replace(b'\r\n', b'')
+    assert read_section(filename, 'two')['b'] == '5'
+
+
+def test_rewrite_sections_keeps_crlf(tmp_path):
+    filename = str(tmp_path / 'tokens.cfg')
+    data = CONFIG.replace('\n', '\r\n').encode()
+    with open(filename, 'wb') as fh:
+        fh.write(data)
+    assert rewrite_sections(filename, lambda s, o: o, 0o600) == 0
+    reclaimed = rewrite_sections(
+        filename, lambda s, o: None if s == 'two' else o, 0o600)
+    with open(filename, 'rb') as fh:
+        new_data = fh.read()
+    assert new_data == data[:data.index(b'[two]')]
+    assert reclaimed == len(data) - len(new_data)
+
+
+def test_multi_client_bulk_tokens(tmp_path, mock_tokens,
+                                  mock_expired_tokens):
+    storage = MultiClientTokenStorage(filename=str(tmp_path / 'tokens.cfg'))
+    storage.write_tokens_by_client({'client-0': mock_tokens,
+                                    'client-1': mock_expired_tokens})
+    storage.write_tokens_by_client({'client-2': mock_tokens})
+    tokens = storage.read_tokens_by_client(['client-0', 'client-1',
+                                            'client-2', 'client-3'])
+    assert tokens['client-0'] == mock_tokens
+    assert tokens['client-1'] == mock_expired_tokens
+    assert tokens['client-2'] == mock_tokens
+    assert tokens['client-3'] == {}
+    assert all(isinstance(ts, TokenGroup)
+               for ts in tokens['client-0'].values())
+    storage.set_client_id('client-1')
+    assert storage.read_tokens() == mock_expired_tokens
+
+
+def test_multi_client_bulk_write_validates(tmp_path, mock_tokens):
+    filename = str(tmp_path / 'tokens.cfg')
+    storage = MultiClientTokenStorage(filename=filename)
+    bad_tokens = {'auth.globus.org': dict(mock_tokens['auth.globus.org'],
+                                          access_token=None)}
+    with pytest.raises(InvalidTokenFormat):
+        storage.write_tokens_by_client({'client-0': mock_tokens,
+                                        'client-1': bad_tokens})
+    assert not os.path.exists(filename)
+
+
+def test_multi_client_storage_sections(tmp_path, mock_tokens):
+    filename = str(tmp_path / 'tokens.cfg')
+    clients = [MultiClientTokenStorage(filename=filename) for _ in range(3)]
+    for num, storage in enumerate(clients):
+        storage.set_client_id('client-{}'.format(num))
+        storage.write_tokens(mock_tokens)
+    clients[1].clear_tokens()
+    assert clients[0].read_tokens() == mock_tokens
+    assert clients[1].read_tokens() == {}
+    assert clients[2].read_tokens() == mock_tokens
+
+
+def test_rewrite_sections(config_file):
+    def rewrite(section, options):
+        if section == 'one':
+            return None
+        return dict(options, c='3')
+    reclaimed = rewrite_sections(config_file, rewrite, 0o600)
+    with open(config_file) as fh:
+        data = fh.read()
+    assert data == '[DEFAULT]\nshared = yes\n\n[two]\nb = 2\nc = 3\n\n'
+    assert reclaimed == len(CONFIG) - len(data)
+    assert rewrite_sections(config_file, lambda s, o: o, 0o600) == 0
+
+
+@pytest.fixture
+def shared_file(tmp_path, mock_tokens, mock_expired_tokens,
+                expired_tokens_with_refresh):
+    filename = str(tmp_path / 'tokens.cfg')
+    storage = MultiClientTokenStorage(filename=filename)
+    # Expired, but recently enough to be kept by the default max_age
+    for tset in expired_tokens_with_refresh.values():
+        tset['expires_at_seconds'] = int(time.time()) - 60
+    for client_id, tokens in [('live', mock_tokens),
+                              ('expired', mock_expired_tokens),
+                              ('refreshable', expired_tokens_with_refresh)]:
+        storage.set_client_id(client_id)
+        storage.write_tokens(tokens)
+    storage.set_client_id('logged-out')
+    storage.clear_tokens()
+    with open(filename, 'a') as fh:
+        fh.write('[settings]\ncolor = blue\n')
+    return filename
+
+
+def test_multi_client_compact(shared_file, mock_tokens,
+                              expired_tokens_with_refresh):
+    size = os.path.getsize(shared_file)
+    storage = MultiClientTokenStorage(filename=shared_file)
+    result = storage.compact()
+    assert result.bytes_reclaimed == size - os.path.getsize(shared_file)
+    assert result.sections_removed == 2
+    assert result.keys_removed == 0
+    config = configparser.ConfigParser()
+    config.read(shared_file)
+    assert config.sections() == ['live', 'refreshable', 'settings']
+    assert os.path.exists(shared_file + '.compacted')
+
+    result = storage.compact(max_age=30)
+    assert result.sections_removed == 1
+    assert result.groups_removed == len(expired_tokens_with_refresh)
+    storage.set_client_id('live')
+    assert storage.read_tokens() == mock_tokens
+
+
+def test_config_parser_compacts_own_section(shared_file):
+    storage = ConfigParserTokenStorage(filename=shared_file,
+                                       section='expired')
+    assert storage.compact().sections_removed == 1
+    config = configparser.ConfigParser()
+    config.read(shared_file)
+    assert 'logged-out' in config.sections()
+    assert 'expired' not in config.sections()
+
+
+def test_auto_compact(shared_file, mock_tokens):
+    storage = MultiClientTokenStorage(filename=shared_file, auto_compact=True)
+    storage.set_client_id('new')
+    storage.write_tokens(mock_tokens)
+    config = configparser.ConfigParser()
+    config.read(shared_file)
+    assert 'expired' not in config.sections()
+    assert not storage.compaction_due()
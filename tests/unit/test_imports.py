@@ -0,0 +1,55 @@
+import subprocess
+import sys
+
+import pytest
+
+import fair_research_login
+
+
+def imported_modules(code):
+    script = '{}\nimport sys\nprint(" ".join(sys.modules))'.format(code)
+    output = subprocess.check_output([sys.executable, '-c', script])
+    return set(output.decode('utf-8').split())
+
+
+def test_storage_import_skips_globus_sdk():
+    modules = imported_modules('from fair_research_login import '
+                               'JSONTokenStorage')
+    assert 'globus_sdk' not in modules
+    assert 'fair_research_login.local_server' not in modules
+
+
+def test_load_tokens_skips_globus_sdk():
+    modules = imported_modules(
+        'from fair_research_login import NativeClient\n'
+        'NativeClient(client_id="foo", token_storage=None)'
+    )
+    assert 'fair_research_login.client' in modules
+    assert 'fair_research_login.local_server' not in modules
+    assert 'globus_sdk' not in modules
+
+
+def test_lazy_attributes():
+    from fair_research_login.client import NativeClient
+    assert fair_research_login.NativeClient is NativeClient
+    assert set(fair_research_login.__all__).issubset(dir(fair_research_login))
+    for name in fair_research_login.__all__:
+        assert getattr(fair_research_login, name)
+
+
+def test_submodules_are_attributes():
+    modules = imported_modules(
+        'import fair_research_login\n'
+        'assert fair_research_login.exc.LoadError\n'
+        'assert fair_research_login.client.NativeClient\n'
+        'assert fair_research_login.token_storage.MultiClientTokenStorage\n'
+        'assert fair_research_login.code_handler.CodeHandler\n'
+        'assert fair_research_login.local_server.LocalServerCodeHandler\n'
+        'assert fair_research_login.version.__version__\n'
+    )
+    assert 'fair_research_login.local_server' in modules
+
+
+def test_unknown_attribute():
+    with pytest.raises(AttributeError):
+        fair_research_login.NotAClient
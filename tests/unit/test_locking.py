@@ -0,0 +1,158 @@
+import os
+import stat
+import threading
+import time
+import pytest
+
+from fair_research_login import ConfigParserTokenStorage, JSONTokenStorage
+from fair_research_login.token_storage.locking import (
+    atomic_write, file_lock, lock_filename, ReadWriteLock
+)
+
+
+def test_atomic_write_replaces_file(tmp_path):
+    filename = str(tmp_path / 'tokens.cfg')
+    with open(filename, 'w') as fh:
+        fh.write('old')
+    with atomic_write(filename, 0o600) as fh:
+        fh.write('new')
+        # Nothing is visible until the write finishes
+        with open(filename) as reader:
+            assert reader.read() == 'old'
+    with open(filename) as fh:
+        assert fh.read() == 'new'
+    assert stat.S_IMODE(os.stat(filename).st_mode) == 0o600
+    assert os.listdir(str(tmp_path)) == ['tokens.cfg']
+
+
+def test_atomic_write_failure_keeps_original(tmp_path):
+    filename = str(tmp_path / 'tokens.cfg')
+    with open(filename, 'w') as fh:
+        fh.write('old')
+    with pytest.raises(ValueError):
+        with atomic_write(filename, 0o600) as fh:
+            fh.write('partial')
+            raise ValueError()
+    with open(filename) as fh:
+        assert fh.read() == 'old'
+    assert os.listdir(str(tmp_path)) == ['tokens.cfg']
+
+
+def test_exclusive_lock_blocks_other_lockers(tmp_path):
+    filename = str(tmp_path / 'tokens.cfg')
+    acquired = threading.Event()
+
+    def take_lock():
+        with file_lock(filename, shared=True):
+            acquired.set()
+
+    with file_lock(filename):
+        thread = threading.Thread(target=take_lock)
+        thread.start()
+        assert not acquired.wait(0.2)
+    assert acquired.wait(5)
+    thread.join()
+    assert os.path.exists(lock_filename(filename))
+
+
+def test_shared_locks_do_not_block(tmp_path):
+    filename = str(tmp_path / 'tokens.cfg')
+    with file_lock(filename, shared=True):
+        with file_lock(filename, shared=True):
+            pass
+
+
+def test_read_write_lock():
+    lock = ReadWriteLock()
+    acquired = threading.Event()
+
+    def take_lock(shared):
+        with (lock.shared() if shared else lock.exclusive()):
+            acquired.set()
+
+    with lock.shared(), lock.shared():
+        thread = threading.Thread(target=take_lock, args=(False,))
+        thread.start()
+        assert not acquired.wait(0.2)
+    assert acquired.wait(5)
+    thread.join()
+    acquired.clear()
+    with lock.exclusive(), lock.shared():
+        # The writer may read, but no other thread may
+        thread = threading.Thread(target=take_lock, args=(True,))
+        thread.start()
+        assert not acquired.wait(0.2)
+    assert acquired.wait(5)
+    thread.join()
+
+
+def test_read_write_lock_is_reentrant():
+    lock = ReadWriteLock()
+    writer_waiting, nested = threading.Event(), threading.Event()
+
+    def read_twice():
+        with lock.shared():
+            writer_waiting.wait(5)
+            # Must not wait behind the queued writer, which waits for us
+            with lock.shared():
+                nested.set()
+
+    def write():
+        with lock.exclusive(), lock.exclusive():
+            pass
+
+    reader = threading.Thread(target=read_twice)
+    reader.start()
+    while not lock._readers:
+        time.sleep(0.01)
+    writer = threading.Thread(target=write)
+    writer.start()
+    while not lock._waiting_writers:
+        time.sleep(0.01)
+    writer_waiting.set()
+    assert nested.wait(5)
+    reader.join(5)
+    writer.join(5)
+    assert not reader.is_alive() and not writer.is_alive()
+
+
+def test_atomic_config_parser_storage(tmp_path, mock_tokens):
+    cfg = ConfigParserTokenStorage(filename=str(tmp_path / 'tokens.cfg'),
+                                   atomic=True)
+    cfg.write_tokens({'auth.globus.org': mock_tokens['auth.globus.org']})
+    cfg.update_tokens({'resource.server.org':
+                       mock_tokens['resource.server.org']})
+    assert set(cfg.read_tokens()) == {'auth.globus.org',
+                                      'resource.server.org'}
+    cfg.clear_tokens()
+    assert cfg.read_tokens() == {}
+
+
+def test_atomic_json_storage(tmp_path, mock_tokens):
+    store = JSONTokenStorage(filename=str(tmp_path / 'tokens.json'),
+                             atomic=True)
+    store.write_tokens({'auth.globus.org': mock_tokens['auth.globus.org']})
+    store.update_tokens({'resource.server.org':
+                         mock_tokens['resource.server.org']})
+    assert set(store.read_tokens()) == {'auth.globus.org',
+                                        'resource.server.org'}
+    store.clear_tokens()
+    assert store.read_tokens() is None
+
+
+def test_concurrent_atomic_updates_are_not_lost(tmp_path, mock_tokens):
+    filename = str(tmp_path / 'tokens.cfg')
+    base = mock_tokens['auth.globus.org']
+
+    def save(num):
+        rs = 'rs{}.example.org'.format(num)
+        cfg = ConfigParserTokenStorage(filename=filename, atomic=True)
+        cfg.update_tokens({rs: dict(base, resource_server=rs)})
+
+    threads = [threading.Thread(target=save, args=(n,)) for n in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    cfg = ConfigParserTokenStorage(filename=filename)
+    assert len(cfg.read_tokens()) == 10
@@ -0,0 +1,111 @@
+import socket
+from uuid import uuid4
+
+import pytest
+from unittest.mock import Mock
+
+from fair_research_login import NativeClient, Metrics, StatsdExporter
+from fair_research_login.exc import TokensExpired
+
+
+def test_metrics_counters_and_timers():
+    metrics = Metrics()
+    metrics.increment('cache_hits')
+    metrics.increment('cache_hits', 2)
+    metrics.observe('refresh', 0.5, resource_server='auth.globus.org')
+    metrics.observe('refresh', 1.5, resource_server='auth.globus.org')
+    assert metrics.counters[('cache_hits', ())] == 3
+    key = ('refresh', (('resource_server', 'auth.globus.org'),))
+    assert metrics.timers[key] == (2, 2.0, 1.5)
+    metrics.reset()
+    assert not metrics.counters and not metrics.timers
+
+
+def test_metrics_timer_records_exceptions():
+    metrics = Metrics()
+    with pytest.raises(ValueError):
+        with metrics.timer('storage_read'):
+            raise ValueError()
+    assert metrics.timers[('storage_read', ())][0] == 1
+
+
+def test_metrics_listeners():
+    metrics, listener = Metrics(), Mock()
+    metrics.add_listener(Mock(side_effect=Exception('Ignored')))
+    metrics.add_listener(listener)
+    metrics.increment('revoke_failures')
+    listener.assert_called_with('counter', 'revoke_failures', 1, {})
+    metrics.remove_listener(listener)
+    metrics.increment('revoke_failures')
+    assert listener.call_count == 1
+
+
+def test_prometheus_text():
+    metrics = Metrics()
+    assert metrics.get_prometheus_text() == ''
+    metrics.increment('cache_misses')
+    metrics.observe('refresh', 0.25, resource_server='a"b')
+    text = metrics.get_prometheus_text()
+    assert '# TYPE fair_research_login_cache_misses_total counter' in text
+    assert 'fair_research_login_cache_misses_total 1\n' in text
+    assert '# TYPE fair_research_login_refresh_seconds summary' in text
+    assert ('fair_research_login_refresh_seconds_count'
+            '{resource_server="a\\"b"} 1') in text
+    assert ('fair_research_login_refresh_seconds_sum'
+            '{resource_server="a\\"b"} 0.25') in text
+
+
+def test_statsd_exporter():
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(('127.0.0.1', 0))
+    receiver.settimeout(5)
+    exporter = StatsdExporter(*receiver.getsockname(), prefix='frl')
+    try:
+        metrics = Metrics()
+        metrics.add_listener(exporter)
+        metrics.observe('refresh', 0.25, resource_server='auth.globus.org')
+        metrics.increment('cache_hits')
+        assert receiver.recv(1024) == b'frl.refresh.auth_globus_org:250.000|ms'
+        assert receiver.recv(1024) == b'frl.cache_hits:1|c'
+    finally:
+        exporter.close()
+        receiver.close()
+
+
+def test_client_reports_storage_and_cache(mem_storage, mock_tokens):
+    metrics = Metrics()
+    cli = NativeClient(client_id=str(uuid4()), token_storage=mem_storage,
+                       token_cache=True, metrics=metrics)
+    mem_storage.tokens = mock_tokens
+    cli.load_tokens()
+    cli.load_tokens()
+    assert metrics.counters[('cache_misses', ())] == 1
+    assert metrics.counters[('cache_hits', ())] == 1
+    cli.save_tokens(mock_tokens)
+    for name in ('storage_read', 'storage_write', 'token_validation',
+                 'load_tokens'):
+        assert metrics.timers[(name, ())][0] >= 1
+
+
+def test_client_reports_refresh(expired_tokens_with_refresh, mem_storage,
+                                mock_refresh_token_authorizer):
+    metrics = Metrics()
+    cli = NativeClient(client_id=str(uuid4()), token_storage=mem_storage,
+                       metrics=metrics)
+    mem_storage.tokens = expired_tokens_with_refresh
+    cli.load_tokens()
+    refreshed = {dict(labels)['resource_server']
+                 for (name, labels) in metrics.timers if name == 'refresh'}
+    assert refreshed == set(expired_tokens_with_refresh)
+
+
+def test_client_reports_refresh_failures(
+        expired_tokens_with_refresh, refresh_authorizer_raises_invalid_grant):
+    metrics = Metrics()
+    cli = NativeClient(client_id=str(uuid4()), token_storage=None,
+                       metrics=metrics)
+    with pytest.raises(TokensExpired):
+        cli.refresh_tokens(expired_tokens_with_refresh)
+    failures = sum(v for (name, _), v in metrics.counters.items()
+                   if name == 'refresh_failures')
+    assert failures == len(expired_tokens_with_refresh)
@@ -0,0 +1,117 @@
+import threading
+import time
+from uuid import uuid4
+
+import pytest
+
+from fair_research_login import NativeClient
+from fair_research_login.exc import TokenStorageDisabled
+from fair_research_login.refresher import TokenRefresher
+
+
+@pytest.fixture
+def refreshable_tokens(mock_tokens):
+    for tset in mock_tokens.values():
+        tset['refresh_token'] = '<Mock Refresh Token>'
+    return mock_tokens
+
+
+def test_refresher_delay_until_next_due(mem_storage, refreshable_tokens):
+    cli = NativeClient(client_id=str(uuid4()), token_storage=mem_storage)
+    refresher = TokenRefresher(cli, margin=100, poll_interval=10 ** 6)
+    now = time.time()
+    refreshable_tokens['auth.globus.org']['expires_at_seconds'] = now + 1000
+    assert refresher.get_delay(refreshable_tokens, now) == 900
+    assert refresher.get_due(refreshable_tokens, now) == {}
+    refreshable_tokens['auth.globus.org']['expires_at_seconds'] = now + 50
+    assert list(refresher.get_due(refreshable_tokens, now)) == [
+        'auth.globus.org']
+    assert refresher.get_delay(refreshable_tokens, now) == 0
+
+
+def test_refresher_ignores_tokens_without_refresh_tokens(mem_storage,
+                                                         mock_expired_tokens):
+    cli = NativeClient(client_id=str(uuid4()), token_storage=mem_storage)
+    refresher = TokenRefresher(cli, poll_interval=30)
+    assert refresher.get_due(mock_expired_tokens) == {}
+    assert refresher.get_delay(mock_expired_tokens) == 30
+
+
+def test_refresher_refreshes_within_margin(mem_storage, refreshable_tokens,
+                                           mock_refresh_token_authorizer):
+    soon = int(time.time()) + 120
+    refreshable_tokens['auth.globus.org']['expires_at_seconds'] = soon
+    mem_storage.tokens = refreshable_tokens
+    cli = NativeClient(client_id=str(uuid4()), token_storage=mem_storage)
+    refresher = TokenRefresher(cli, margin=300)
+    delay = refresher.refresh_due()
+    saved = mem_storage.tokens['auth.globus.org']
+    assert saved['access_token'] == '<Refreshed Access Token>'
+    assert saved['expires_at_seconds'] > soon
+    assert mem_storage.tokens['resource.server.org']['access_token'] == (
+        '<token>')
+    assert 0 < delay <= refresher.poll_interval
+
+
+def test_refresher_skips_rejected_refresh_tokens(
+        mem_storage, refreshable_tokens,
+        refresh_authorizer_raises_invalid_grant):
+    import globus_sdk
+    for tset in refreshable_tokens.values():
+        tset['expires_at_seconds'] = 0
+    mem_storage.tokens = refreshable_tokens
+    cli = NativeClient(client_id=str(uuid4()), token_storage=mem_storage)
+    refresher = TokenRefresher(cli, margin=60, poll_interval=300)
+    ensure_valid_token = globus_sdk.RefreshTokenAuthorizer.ensure_valid_token
+    assert refresher.refresh_due() == 300
+    assert ensure_valid_token.call_count == 3
+    assert refresher.refresh_due() == 300
+    assert ensure_valid_token.call_count == 3
+    # A new refresh token is tried again
+    mem_storage.tokens['auth.globus.org']['refresh_token'] = '<New Token>'
+    assert list(refresher.get_due(mem_storage.tokens)) == ['auth.globus.org']
+
+
+def test_client_start_and_stop_refresher(mem_storage, refreshable_tokens,
+                                         mock_refresh_token_authorizer):
+    refreshable_tokens['auth.globus.org']['expires_at_seconds'] = 0
+    mem_storage.tokens = refreshable_tokens
+    cli = NativeClient(client_id=str(uuid4()), token_storage=mem_storage)
+    refresher = cli.start_refresher(margin=60)
+    assert refresher.daemon
+    for _ in range(50):
+        token = mem_storage.tokens['auth.globus.org']['access_token']
+        if token == '<Refreshed Access Token>':
+            break
+        time.sleep(0.1)
+    cli.stop_refresher()
+    assert not refresher.is_alive()
+    assert mem_storage.tokens['auth.globus.org']['access_token'] == (
+        '<Refreshed Access Token>')
+
+
+def test_concurrent_start_refresher_leaves_one_running(mem_storage,
+                                                       refreshable_tokens):
+    mem_storage.tokens = refreshable_tokens
+    cli = NativeClient(client_id=str(uuid4()), token_storage=mem_storage)
+    started, barrier = [], threading.Barrier(16)
+
+    def start():
+        barrier.wait()
+        started.append(cli.start_refresher(poll_interval=10 ** 6))
+
+    for _ in range(10):
+        threads = [threading.Thread(target=start) for _ in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    cli.stop_refresher()
+    assert len(started) == 160
+    assert not any(refresher.is_alive() for refresher in started)
+
+
+def test_refresher_requires_storage():
+    cli = NativeClient(client_id=str(uuid4()), token_storage=None)
+    with pytest.raises(TokenStorageDisabled):
+        cli.start_refresher()
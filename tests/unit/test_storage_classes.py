@@ -1,8 +1,11 @@
 import uuid
 import os
+import stat
 
 from unittest.mock import Mock, mock_open, patch
 from fair_research_login import (ConfigParserTokenStorage, JSONTokenStorage,
+                                 SQLiteTokenStorage,
+                                 MultiClientSQLiteTokenStorage,
                                  NativeClient)
 from .mocks import MOCK_TOKEN_SET, CONFIGPARSER_VALID_CFG
 
@@ -63,3 +66,72 @@ def test_config_parser_clear_token_storage(monkeypatch):
     cfg.clear_tokens()
     assert mock_save.called
     assert mock_save.call_args[0][0].items('tokens') == []
+
+
+def test_json_token_storage_update_tokens(tmp_path, mock_tokens):
+    store = JSONTokenStorage(filename=str(tmp_path / 'tokens.json'))
+    store.write_tokens({'auth.globus.org': mock_tokens['auth.globus.org']})
+    store.update_tokens({'resource.server.org':
+                         mock_tokens['resource.server.org']})
+    assert set(store.read_tokens()) == {'auth.globus.org',
+                                        'resource.server.org'}
+
+
+def test_config_parser_update_tokens(tmp_path, mock_tokens):
+    cfg = ConfigParserTokenStorage(filename=str(tmp_path / 'tokens.cfg'))
+    cfg.write_tokens({'auth.globus.org': mock_tokens['auth.globus.org']})
+    cfg.update_tokens({'resource.server.org':
+                       mock_tokens['resource.server.org']})
+    assert set(cfg.read_tokens()) == {'auth.globus.org',
+                                      'resource.server.org'}
+
+
+def test_save_tokens_uses_update_tokens(tmp_path, mock_tokens):
+    cfg = ConfigParserTokenStorage(filename=str(tmp_path / 'tokens.cfg'))
+    cfg.read_tokens = Mock(wraps=cfg.read_tokens)
+    cli = NativeClient(client_id=str(uuid.uuid4()), token_storage=cfg)
+    cli.save_tokens(mock_tokens)
+    assert not cfg.read_tokens.called
+    assert cli.load_tokens() == MOCK_TOKEN_SET
+
+
+def test_sqlite_token_storage(tmp_path, mock_tokens, mock_revoke):
+    store = SQLiteTokenStorage(filename=str(tmp_path / 'tokens.db'))
+    cli = NativeClient(client_id=str(uuid.uuid4()), token_storage=store)
+    cli.save_tokens(mock_tokens)
+    assert cli.load_tokens() == MOCK_TOKEN_SET
+    cli.logout()
+    assert store.read_tokens() == {}
+
+
+def test_sqlite_token_storage_upsert(tmp_path, mock_tokens):
+    store = SQLiteTokenStorage(filename=str(tmp_path / 'tokens.db'))
+    store.write_tokens(mock_tokens)
+    updated = dict(mock_tokens['auth.globus.org'], access_token='new')
+    store.update_tokens({'auth.globus.org': updated})
+    tokens = store.read_tokens()
+    assert len(tokens) == 3
+    assert tokens['auth.globus.org']['access_token'] == 'new'
+
+    store.write_tokens({'auth.globus.org': updated})
+    assert list(store.read_tokens()) == ['auth.globus.org']
+
+
+def test_sqlite_token_storage_file_setup(tmp_path):
+    filename = str(tmp_path / 'tokens.db')
+    store = SQLiteTokenStorage(filename=filename)
+    store.read_tokens()
+    mode = store.connect().execute('PRAGMA journal_mode').fetchone()[0]
+    assert mode == 'wal'
+    assert stat.S_IMODE(os.stat(filename).st_mode) == 0o600
+
+
+def test_multi_client_sqlite_token_storage(tmp_path, mock_tokens):
+    filename = str(tmp_path / 'tokens.db')
+    clients = [NativeClient(client_id=str(uuid.uuid4()),
+                            token_storage=MultiClientSQLiteTokenStorage(
+                                filename=filename))
+               for _ in range(2)]
+    clients[0].save_tokens(mock_tokens)
+    assert clients[0].load_tokens() == MOCK_TOKEN_SET
+    assert clients[1].token_storage.read_tokens() == {}
@@ -1,8 +1,12 @@
+import copy
 import json
+import pickle
+import time
 import pytest
 
 from fair_research_login.token_storage import (
-    check_expired, check_scopes, flat_pack, flat_unpack, verify_token_group
+    check_expired, check_scopes, flat_pack, flat_unpack, verify_token_group,
+    is_expired, get_scope_index, TokenGroup, compact_flat_tokens
 )
 from fair_research_login.exc import (
     TokensExpired, ScopesMismatch, InvalidTokenFormat
@@ -50,6 +54,21 @@ def test_check_scopes_with_differing_scope(mock_tokens):
     assert check_scopes(mock_tokens, ['custom_scope']) is None
 
 
+def test_get_scope_index(mock_tokens):
+    index = get_scope_index(mock_tokens)
+    assert index['openid'] == 'auth.globus.org'
+    assert index['custom_scope'] == 'resource.server.org'
+    for scope, rs in index.items():
+        assert scope in mock_tokens[rs]['scope'].split()
+
+
+def test_check_scopes_with_scope_index(mock_tokens):
+    index = get_scope_index(mock_tokens)
+    assert check_scopes(mock_tokens, ['openid'], scope_index=index) is None
+    with pytest.raises(ScopesMismatch):
+        check_scopes(mock_tokens, ['never_requested'], scope_index=index)
+
+
 def test_valid_test_tokens(mock_tokens, mock_expired_tokens,
                            expired_tokens_with_refresh):
     tokens = list(mock_tokens.values())
@@ -91,3 +110,99 @@ def test_flat_unpack_rs_with_underscores(mock_tokens_underscores):
 
 def test_flat_unpack_with_empty_value():
     assert flat_unpack({}) == {}
+
+
+def test_check_expired_with_margin(mock_tokens):
+    for tset in mock_tokens.values():
+        tset['expires_at_seconds'] = int(time.time()) + 30
+    assert check_expired(mock_tokens) is None
+    with pytest.raises(TokensExpired):
+        check_expired(mock_tokens, margin=60)
+
+
+def test_is_expired_margin():
+    token_set = {'expires_at_seconds': int(time.time()) + 30}
+    assert not is_expired(token_set)
+    assert is_expired(token_set, margin=60)
+
+
+def test_token_group_from_dict(mock_tokens):
+    tset = mock_tokens['auth.globus.org']
+    group = TokenGroup.from_dict(tset)
+    assert group == tset
+    assert dict(group) == tset
+    assert group.to_dict() == tset
+    assert group['scope'] == 'openid profile email'
+    assert len(group) == 6
+    assert TokenGroup.from_dict(group) is group
+
+
+def test_token_group_is_immutable(mock_tokens):
+    group = TokenGroup.from_dict(mock_tokens['auth.globus.org'])
+    with pytest.raises(AttributeError):
+        group.access_token = 'changed'
+    with pytest.raises(TypeError):
+        group['access_token'] = 'changed'
+    assert not hasattr(group, '__dict__')
+    changed = group.replace(access_token='changed')
+    assert changed.access_token == 'changed'
+    assert group.access_token == '<token>'
+
+
+def test_token_group_keys(mock_tokens):
+    tset = mock_tokens['auth.globus.org']
+    group = TokenGroup.from_dict(tset)
+    assert group.keys() == tset.keys()
+    assert group.keys() - {'scope'} == tset.keys() - {'scope'}
+
+
+def test_token_group_copy(mock_tokens):
+    group = TokenGroup.from_dict(mock_tokens['auth.globus.org'])
+    assert copy.copy(group) is group
+    assert copy.deepcopy(group) is group
+    assert copy.deepcopy({'auth.globus.org': group}) == {
+        'auth.globus.org': group}
+
+
+def test_token_group_pickle(mock_tokens):
+    group = TokenGroup.from_dict(dict(mock_tokens['auth.globus.org'],
+                                      refresh_token='<refresh>'))
+    loaded = pickle.loads(pickle.dumps(group))
+    assert isinstance(loaded, TokenGroup)
+    assert loaded.to_dict() == group.to_dict()
+
+
+def test_token_group_missing_key(mock_tokens):
+    group = TokenGroup.from_dict(mock_tokens['auth.globus.org'])
+    with pytest.raises(KeyError):
+        group['foo']
+    assert group.get('foo') is None
+
+
+@pytest.mark.parametrize('tokens', load_json(INVALID_TOKENS_FILE))
+def test_token_group_rejects_invalid_tokens(tokens):
+    with pytest.raises(InvalidTokenFormat):
+        TokenGroup.from_dict(tokens)
+
+
+def test_compact_flat_tokens(mock_tokens, mock_expired_tokens,
+                             expired_tokens_with_refresh):
+    live = flat_pack(mock_tokens)
+    refreshable = flat_pack(expired_tokens_with_refresh)
+    tokens = dict(live)
+    tokens.update(flat_pack({'expired.org': dict(
+        mock_expired_tokens['auth.globus.org'],
+        resource_server='expired.org')}))
+    tokens.update({'stray': 'value', 'partial.org__scope': 'foo'})
+    kept, groups, keys = compact_flat_tokens(tokens)
+    assert kept == live
+    assert (groups, keys) == (1, 2)
+    assert compact_flat_tokens(refreshable) == (refreshable, 0, 0)
+
+
+def test_compact_flat_tokens_max_age(mock_tokens, expired_tokens_with_refresh):
+    refreshable = flat_pack(expired_tokens_with_refresh)
+    assert compact_flat_tokens(refreshable, max_age=60) == (
+        {}, len(expired_tokens_with_refresh), 0)
+    live = flat_pack(mock_tokens)
+    assert compact_flat_tokens(live, max_age=60) == (live, 0, 0)
@@ -0,0 +1,71 @@
+import os
+import uuid
+from unittest.mock import Mock
+
+from fair_research_login import NativeClient, ConfigParserTokenStorage
+from fair_research_login.token_storage import TokenCache
+
+
+def test_token_cache_skips_storage_reads(mem_storage, mock_tokens):
+    mem_storage.tokens = mock_tokens
+    mem_storage.read_tokens = Mock(wraps=mem_storage.read_tokens)
+    cli = NativeClient(client_id=str(uuid.uuid4()), token_storage=mem_storage,
+                       token_cache=True)
+    assert cli.load_tokens() == mock_tokens
+    assert cli.load_tokens() == mock_tokens
+    cli.get_authorizers()
+    assert mem_storage.read_tokens.call_count == 1
+
+
+def test_token_cache_returns_copies(mem_storage, mock_tokens):
+    mem_storage.tokens = mock_tokens
+    cli = NativeClient(client_id=str(uuid.uuid4()), token_storage=mem_storage,
+                       token_cache=True)
+    cli.load_tokens()['auth.globus.org']['access_token'] = 'modified'
+    assert cli.load_tokens()['auth.globus.org']['access_token'] == '<token>'
+
+
+def test_token_cache_invalidated_on_save(mem_storage, mock_tokens):
+    cli = NativeClient(client_id=str(uuid.uuid4()), token_storage=mem_storage,
+                       token_cache=True)
+    cli.save_tokens({'auth.globus.org': mock_tokens['auth.globus.org']})
+    assert list(cli.load_tokens()) == ['auth.globus.org']
+    cli.save_tokens(mock_tokens)
+    assert cli.load_tokens() == mock_tokens
+
+
+def test_token_cache_invalidated_on_logout(mem_storage, mock_tokens,
+                                           mock_revoke):
+    mem_storage.tokens = mock_tokens
+    cli = NativeClient(client_id=str(uuid.uuid4()), token_storage=mem_storage,
+                       token_cache=True)
+    cli.load_tokens()
+    cli.logout()
+    assert cli._load_token_groups() == {}
+
+
+def test_token_cache_detects_file_changes(tmp_path, mock_tokens):
+    filename = str(tmp_path / 'tokens.cfg')
+    cache = TokenCache()
+    writer = NativeClient(client_id=str(uuid.uuid4()),
+                          token_storage=ConfigParserTokenStorage(filename))
+    reader = NativeClient(client_id=str(uuid.uuid4()),
+                          token_storage=ConfigParserTokenStorage(filename),
+                          token_cache=cache)
+    writer.save_tokens({'auth.globus.org': mock_tokens['auth.globus.org']})
+    assert list(reader.load_tokens()) == ['auth.globus.org']
+
+    writer.save_tokens(mock_tokens)
+    # Guard against coarse filesystem timestamps hiding the change
+    os.utime(filename, ns=(0, 0))
+    assert reader.load_tokens() == mock_tokens
+
+
+def test_token_cache_keyed_by_section(tmp_path, mock_tokens):
+    filename = str(tmp_path / 'tokens.cfg')
+    cache = TokenCache()
+    one = ConfigParserTokenStorage(filename, section='one')
+    two = ConfigParserTokenStorage(filename, section='two')
+    one.write_tokens(mock_tokens)
+    assert cache.load(one, one.read_tokens) == mock_tokens
+    assert cache.load(two, two.read_tokens) == {}
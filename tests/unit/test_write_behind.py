@@ -0,0 +1,127 @@
+import time
+from unittest.mock import Mock
+from uuid import uuid4
+
+from fair_research_login import NativeClient, MultiClientTokenStorage
+from fair_research_login.token_storage import WriteBehindTokenStorage
+from fair_research_login.token_storage.write_behind import _flush_all
+from .mocks import MemoryStorage
+
+
+def test_write_behind_coalesces_updates(mock_tokens):
+    mem_storage = MemoryStorage()
+    mem_storage.write_tokens = Mock(wraps=mem_storage.write_tokens)
+    storage = WriteBehindTokenStorage(mem_storage, delay=60)
+    for rs, ts in mock_tokens.items():
+        storage.update_tokens({rs: ts})
+        storage.update_tokens({rs: ts})
+    assert not mem_storage.write_tokens.called
+    assert storage.read_tokens() == mock_tokens
+    assert storage.pending == mock_tokens
+    storage.flush()
+    assert mem_storage.write_tokens.call_count == 1
+    assert mem_storage.tokens == mock_tokens
+    assert storage.pending == {}
+    storage.flush()
+    assert mem_storage.write_tokens.call_count == 1
+
+
+def test_write_behind_uses_update_tokens(tmp_path, mock_tokens):
+    wrapped = MultiClientTokenStorage(filename=str(tmp_path / 'tokens.cfg'))
+    wrapped.set_client_id('foo')
+    wrapped.write_tokens({'auth.globus.org': mock_tokens['auth.globus.org']})
+    wrapped.update_tokens = Mock(wraps=wrapped.update_tokens)
+    storage = WriteBehindTokenStorage(wrapped, delay=60)
+    storage.update_tokens({'resource.server.org':
+                           mock_tokens['resource.server.org']})
+    storage.flush()
+    assert wrapped.update_tokens.call_count == 1
+    assert set(wrapped.read_tokens()) == {'auth.globus.org',
+                                          'resource.server.org'}
+
+
+def test_write_behind_write_replaces_tokens(mock_tokens):
+    mem_storage = MemoryStorage()
+    mem_storage.tokens = mock_tokens
+    storage = WriteBehindTokenStorage(mem_storage, delay=60)
+    new_tokens = {'auth.globus.org': mock_tokens['auth.globus.org']}
+    storage.write_tokens(new_tokens)
+    assert storage.read_tokens() == new_tokens
+    storage.flush()
+    assert mem_storage.tokens == new_tokens
+
+
+def test_write_behind_flushes_on_size(mock_tokens):
+    mem_storage = MemoryStorage()
+    storage = WriteBehindTokenStorage(mem_storage, delay=60, max_pending=3)
+    storage.update_tokens({'auth.globus.org': mock_tokens['auth.globus.org']})
+    assert mem_storage.tokens == {}
+    storage.update_tokens(mock_tokens)
+    assert mem_storage.tokens == mock_tokens
+
+
+def test_write_behind_flushes_on_timer(mock_tokens):
+    mem_storage = MemoryStorage()
+    storage = WriteBehindTokenStorage(mem_storage, delay=0.05)
+    storage.update_tokens(mock_tokens)
+    for _ in range(100):
+        if mem_storage.tokens:
+            break
+        time.sleep(0.05)
+    assert mem_storage.tokens == mock_tokens
+
+
+def test_write_behind_flushes_at_exit(mock_tokens):
+    mem_storage = MemoryStorage()
+    storage = WriteBehindTokenStorage(mem_storage, delay=60)
+    storage.update_tokens(mock_tokens)
+    # Registered with atexit
+    _flush_all()
+    assert mem_storage.tokens == mock_tokens
+
+
+def test_write_behind_retries_failed_writes(mock_tokens):
+    mem_storage = MemoryStorage()
+    write_tokens = mem_storage.write_tokens
+
+    def fail_once(tokens):
+        if mem_storage.write_tokens.call_count == 1:
+            raise OSError('Disk full')
+        write_tokens(tokens)
+
+    mem_storage.write_tokens = Mock(side_effect=fail_once)
+    storage = WriteBehindTokenStorage(mem_storage, delay=0.05)
+    storage.update_tokens(mock_tokens)
+    for _ in range(100):
+        if mem_storage.tokens:
+            break
+        time.sleep(0.05)
+    assert mem_storage.write_tokens.call_count == 2
+    assert mem_storage.tokens == mock_tokens
+    assert storage.pending == {}
+
+
+def test_write_behind_clear_drops_pending(mock_tokens):
+    mem_storage = MemoryStorage()
+    mem_storage.tokens = mock_tokens
+    storage = WriteBehindTokenStorage(mem_storage, delay=60)
+    storage.update_tokens(mock_tokens)
+    storage.clear_tokens()
+    assert storage.pending == {}
+    assert storage.read_tokens() == {}
+    assert mem_storage.tokens == {}
+
+
+def test_write_behind_with_native_client(tmp_path, mock_tokens):
+    wrapped = MultiClientTokenStorage(filename=str(tmp_path / 'tokens.cfg'))
+    storage = WriteBehindTokenStorage(wrapped, delay=60)
+    client_id = str(uuid4())
+    cli = NativeClient(client_id=client_id, token_storage=storage,
+                       token_cache=True)
+    assert storage.section == client_id
+    cli.save_tokens(mock_tokens)
+    assert wrapped.read_tokens() == {}
+    assert cli.load_tokens() == mock_tokens
+    storage.flush()
+    assert wrapped.read_tokens() == mock_tokens
+    assert cli.load_tokens() == mock_tokens